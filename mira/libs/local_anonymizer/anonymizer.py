@@ -13,6 +13,18 @@ LOG = logging.getLogger(__name__)
 class LocalAnonymizer:
     """Anonymize text using Presidio for PII detection."""
 
+    # Map PII category names to entity tag prefixes
+    TAG_NAMES = {
+        "persons": "PERSON",
+        "emails": "EMAIL",
+        "phones": "PHONE",
+        "addresses": "ADDRESS",
+        "organizations": "ORG",
+        "credit_cards": "CREDITCARD",
+        "ssn": "SSN",
+        "ipv4": "IP"
+    }
+
     @classmethod
     def create_from_config(cls, config: Dict[str, Any]) -> "LocalAnonymizer":
         """Create a LocalAnonymizer instance from configuration.
@@ -36,7 +48,7 @@ class LocalAnonymizer:
 
         Args:
             max_input_tokens: Maximum tokens per chunk sent to backend
-            presidio_config: Configuration dictionary for Presidio backend (language, confidence_threshold, nlp_configuration)
+            presidio_config: Configuration dictionary for Presidio backend (language, confidence_threshold, nlp_configuration, cache_dir, n_process)
         """
         self.max_input_tokens = max_input_tokens
 
@@ -53,7 +65,9 @@ class LocalAnonymizer:
         self.backend = PresidioBackend(
             language=presidio_config.get('language', 'en'),
             confidence_threshold=presidio_config.get('confidence_threshold', 0.0),
-            nlp_configuration=presidio_config.get('nlp_configuration')
+            nlp_configuration=presidio_config.get('nlp_configuration'),
+            cache_dir=presidio_config.get('cache_dir'),
+            n_process=presidio_config.get('n_process', 1)
         )
         LOG.info(f"LocalAnonymizer initialized with Presidio backend (lang={presidio_config.get('language', 'en')}, confidence={presidio_config.get('confidence_threshold', 0.0)})")
     
@@ -72,6 +86,37 @@ class LocalAnonymizer:
 
         # Note: We don't reset counters or memory here anymore
         # Use reset() method to clear state for independent runs
+        return self.replace_pii(text, self.detect_pii(text))
+
+    def anonymize_data_batch(self, texts: List[str]) -> List[Tuple[str, Dict[str, str]]]:
+        """Anonymize several texts, detecting PII in all of them with one backend batch.
+
+        Replacement still runs text by text in input order, so entity tags are
+        assigned exactly as if anonymize_data() had been called on each text.
+
+        Args:
+            texts: Texts to anonymize
+
+        Returns:
+            One (anonymized_text, mappings) tuple per input text
+        """
+        detections = self.detect_pii_batch(texts)
+        return [
+            self.replace_pii(text, pii_data) if text else (text, {})
+            for text, pii_data in zip(texts, detections)
+        ]
+
+    def detect_pii(self, text: str) -> Dict[str, List[str]]:
+        """Detect PII in text without replacing it.
+
+        Args:
+            text: Text to analyze
+
+        Returns:
+            Dictionary of detected PII by category
+        """
+        if not text:
+            return {}
 
         # Always use chunking for consistency (even for small texts)
         pii_data = self._detect_pii_chunked(text)
@@ -80,8 +125,47 @@ class LocalAnonymizer:
         regex_pii = self._detect_regex_patterns(text)
 
         # Merge LLM and regex detections
-        pii_data = self._merge_pii_data(pii_data, regex_pii)
+        return self._merge_pii_data(pii_data, regex_pii)
+
+    def detect_pii_batch(self, texts: List[str]) -> List[Dict[str, List[str]]]:
+        """Detect PII in several texts, sending all their chunks to the backend at once.
+
+        Args:
+            texts: Texts to analyze
+
+        Returns:
+            One dictionary of detected PII by category per input text
+        """
+        # Chunk every text, remembering which chunks belong to which text
+        all_chunks = []
+        spans = []
+        for text in texts:
+            chunks = self._chunk(text) if text else []
+            spans.append((len(all_chunks), len(all_chunks) + len(chunks)))
+            all_chunks.extend(chunks)
+
+        chunk_results = self.backend.detect_pii_batch(all_chunks) if all_chunks else []
+
+        results = []
+        for text, (start, end) in zip(texts, spans):
+            if not text:
+                results.append({})
+                continue
+            pii_data = self._merge_pii_results(chunk_results[start:end])
+            results.append(self._merge_pii_data(pii_data, self._detect_regex_patterns(text)))
+        return results
+
+    def replace_pii(self, text: str, pii_data: Dict[str, List[str]]) -> Tuple[str, Dict[str, str]]:
+        """Replace detected PII in text with consistent entity tags.
+
+        Args:
+            text: Text to anonymize
+            pii_data: Detected PII by category, as returned by detect_pii()
 
+        Returns:
+            Tuple of (anonymized_text, mappings)
+            where mappings is a flat dict of token -> original
+        """
         # Generate replacements and create mappings
         mappings = {}  # Flat dict: token -> original
         anonymized_text = text
@@ -122,6 +206,10 @@ class LocalAnonymizer:
         self.entity_counters = defaultdict(int)
         self.entity_memory = {}
         LOG.debug("LocalAnonymizer state reset")
+
+    def close(self) -> None:
+        """Release backend resources, committing and closing its detection cache."""
+        self.backend.close()
     
     def _detect_regex_patterns(self, text: str) -> Dict[str, List[str]]:
         """Detect common PII patterns using regex.
@@ -195,20 +283,8 @@ class LocalAnonymizer:
         Returns:
             Entity tag like REDACTED_PERSON1, REDACTED_EMAIL2, etc.
         """
-        # Map category names to tag prefixes
-        tag_names = {
-            "persons": "PERSON",
-            "emails": "EMAIL",
-            "phones": "PHONE",
-            "addresses": "ADDRESS",
-            "organizations": "ORG",
-            "credit_cards": "CREDITCARD",
-            "ssn": "SSN",
-            "ipv4": "IP"
-        }
-        
         # Get the tag name or use the category in uppercase
-        tag_name = tag_names.get(category, category.upper().rstrip('S'))
+        tag_name = self.TAG_NAMES.get(category) or category.upper().rstrip('S')
         
         # Increment counter for this category
         self.entity_counters[tag_name] += 1
@@ -226,6 +302,20 @@ class LocalAnonymizer:
         Returns:
             Dictionary of detected PII by category
         """
+        chunks = self._chunk(text)
+        LOG.debug(f"Split text into {len(chunks)} chunks")
+
+        # Process each chunk; several chunks go through the backend as one batch
+        if len(chunks) == 1:
+            chunk_results = [self.backend.detect_pii(chunks[0])]
+        else:
+            chunk_results = self.backend.detect_pii_batch(chunks)
+
+        # Merge results from all chunks
+        return self._merge_pii_results(chunk_results)
+
+    def _chunk(self, text: str) -> List[str]:
+        """Split text into chunks that fit the backend's input size."""
         # Use the text_chunker utility
         lookback_words = 5  # Number of words to overlap between chunks
         chunk_generator = chunk_text(
@@ -234,18 +324,7 @@ class LocalAnonymizer:
             self.max_input_tokens,
             lookback_words
         )
-        chunks = list(chunk_generator)  # Convert to list for counting
-        LOG.debug(f"Split text into {len(chunks)} chunks")
-
-        # Process each chunk
-        chunk_results = []
-        for i, chunk in enumerate(chunks):
-            LOG.debug(f"Processing chunk {i+1}/{len(chunks)}")
-            result = self.backend.detect_pii(chunk)
-            chunk_results.append(result)
-
-        # Merge results from all chunks
-        return self._merge_pii_results(chunk_results)
+        return list(chunk_generator)
 
     def _merge_pii_results(self, results: List[Dict[str, List[str]]]) -> Dict[str, List[str]]:
         """Merge PII detection results from multiple chunks.
@@ -1,15 +1,23 @@
 """Presidio backend for PII detection."""
 
+import hashlib
+import json
 import logging
+import sqlite3
+from importlib import metadata
+from pathlib import Path
 from typing import Dict, List, Optional
 
 from markdown_it.common.entities import entities
-from presidio_analyzer import AnalyzerEngine, RecognizerRegistry
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, RecognizerRegistry
 from presidio_analyzer.predefined_recognizers import SpacyRecognizer, EmailRecognizer, PhoneRecognizer, \
     CreditCardRecognizer, UsSsnRecognizer
 
 LOG = logging.getLogger(__name__)
 
+# Single-text detections written to the cache before they are committed together
+_CACHE_COMMIT_EVERY = 256
+
 
 # Set log level to presidio to WARNING to reduce noise
 logging.getLogger("presidio-analyzer").setLevel(logging.WARNING)
@@ -41,13 +49,19 @@ class PresidioBackend:
 
     def __init__(self, language: str = "en", confidence_threshold: float = 0.0,
                  nlp_configuration: Optional[Dict] = None,
-                 entities=None):
+                 entities=None,
+                 cache_dir: Optional[Path] = None,
+                 n_process: int = 1):
         """Initialize the Presidio backend.
 
         Args:
             language: Language for analysis (default: "en")
             confidence_threshold: Minimum confidence score for detection (0.0-1.0)
             nlp_configuration: Complete NLP configuration dict for NlpEngineProvider
+            cache_dir: Optional directory for a SQLite cache of detections, keyed
+                by a hash of the text and the analyzer settings. Cached entries
+                contain the original PII, so keep this out of shared locations.
+            n_process: Number of worker processes spaCy uses for batched detection
         """
         self.language = language
         self.confidence_threshold = confidence_threshold
@@ -55,35 +69,172 @@ class PresidioBackend:
             "nlp_engine_name": "spacy",
             "models": [{"lang_code": "en", "model_name": "en_core_web_sm"}]
         }
+        self.n_process = n_process
         self.analyzer: AnalyzerEngine = None
-        self._initialized = False
 
-    def _ensure_initialized(self):
-        """Lazy initialization of the AnalyzerEngine."""
-        if not self._initialized:
-            model_info = self.nlp_configuration.get('models', [{}])[0]
-            model_name = model_info.get('model_name', 'default')
-            LOG.info(f"Initializing Presidio AnalyzerEngine with {model_name}")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._cache_db: Optional[sqlite3.Connection] = None
+        self._uncommitted = 0
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._cache_salt = self._compute_cache_salt()
+            self._cache_db = sqlite3.connect(self.cache_dir / "detections.sqlite")
+            self._cache_db.execute(
+                "CREATE TABLE IF NOT EXISTS detections (key BLOB PRIMARY KEY, pii TEXT NOT NULL)"
+            )
+
+    def _ensure_initialized(self) -> AnalyzerEngine:
+        """Lazy initialization of the AnalyzerEngine.
+
+        Returns:
+            The initialized AnalyzerEngine. Hot paths should use
+            ``self.analyzer or self._ensure_initialized()`` so that, once
+            initialized, the call costs a single attribute load.
+        """
+        if self.analyzer is not None:
+            return self.analyzer
+
+        model_info = self.nlp_configuration.get('models', [{}])[0]
+        model_name = model_info.get('model_name', 'default')
+        LOG.info(f"Initializing Presidio AnalyzerEngine with {model_name}")
+
+        # Use the configured spaCy model
+        from presidio_analyzer.nlp_engine import NlpEngineProvider
+
+        # Use the nlp_configuration directly
+        provider = NlpEngineProvider(nlp_configuration=self.nlp_configuration)
+
+        nlp_engine = provider.create_engine()
+
+        registry = RecognizerRegistry([
+            SpacyRecognizer(supported_entities=["PERSON"], supported_language="en"),
+            EmailRecognizer(),
+            PhoneRecognizer(),
+            CreditCardRecognizer(),
+            UsSsnRecognizer(),
+        ])
+        self.analyzer = AnalyzerEngine(registry=registry, nlp_engine=nlp_engine)
+        LOG.info(f"Initialized with {model_name} model for language {self.language}")
+
+        return self.analyzer
+
+    def _compute_cache_salt(self) -> bytes:
+        """Settings that invalidate cached detections when they change."""
+        try:
+            presidio_version = metadata.version("presidio-analyzer")
+        except metadata.PackageNotFoundError:
+            presidio_version = "unknown"
+        # Upgrading a spaCy model keeps its name, so key on its version too
+        model_versions = {}
+        for model in self.nlp_configuration.get("models", []):
+            model_name = model.get("model_name")
+            if not model_name:
+                continue
+            try:
+                model_versions[model_name] = metadata.version(model_name)
+            except metadata.PackageNotFoundError:
+                model_versions[model_name] = "unknown"
+        settings = {
+            "language": self.language,
+            "confidence_threshold": self.confidence_threshold,
+            "nlp_configuration": self.nlp_configuration,
+            "presidio_version": presidio_version,
+            "model_versions": model_versions,
+        }
+        return json.dumps(settings, sort_keys=True).encode("utf-8")
+
+    def _cache_key(self, text: str) -> bytes:
+        """Cache key for ``text`` under the current analyzer settings."""
+        digest = hashlib.blake2b(self._cache_salt, digest_size=16)
+        digest.update(text.encode("utf-8", errors="surrogatepass"))
+        return digest.digest()
+
+    def _load_cached(self, keys: List[bytes]) -> Dict[bytes, Dict[str, List[str]]]:
+        """Return the cached detections found for ``keys``."""
+        found = {}
+        # Stay well under SQLite's limit on bound parameters per statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._cache_db.execute(
+                f"SELECT key, pii FROM detections WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for key, pii in rows:
+                found[key] = json.loads(pii)
+        return found
+
+    def _store_cached(self, entries: List[tuple]) -> None:
+        """Store (key, pii_data) pairs in the open transaction; flush_cache() commits them.
+
+        A cache that cannot be written (e.g. locked by another run) only costs
+        speed, so errors are logged rather than raised.
+        """
+        try:
+            self._cache_db.executemany(
+                "INSERT OR REPLACE INTO detections (key, pii) VALUES (?, ?)",
+                [(key, json.dumps(pii_data)) for key, pii_data in entries]
+            )
+        except sqlite3.Error as e:
+            LOG.warning(f"Could not cache Presidio detections: {e}")
+            return
+        self._uncommitted += len(entries)
+
+    def flush_cache(self) -> None:
+        """Commit detections stored since the last commit."""
+        if self._cache_db is None or not self._uncommitted:
+            return
+        try:
+            self._cache_db.commit()
+        except sqlite3.Error as e:
+            LOG.warning(f"Could not commit cached Presidio detections: {e}")
+            self._cache_db.rollback()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        """Commit pending detections and close the cache; later calls run uncached."""
+        if self._cache_db is None:
+            return
+        self.flush_cache()
+        self._cache_db.close()
+        self._cache_db = None
+
+    def clear_cache(self) -> None:
+        """Remove all cached detections so the next calls run the analyzer."""
+        if self._cache_db is None:
+            return
+        with self._cache_db:
+            self._cache_db.execute("DELETE FROM detections")
+        self._uncommitted = 0
 
-            # Use the configured spaCy model
-            from presidio_analyzer.nlp_engine import NlpEngineProvider
+    def _group_results(self, text: str, analyzer_results) -> Dict[str, List[str]]:
+        """Group Presidio results for ``text`` into our PII categories."""
+        pii_data = {}
+        for result in analyzer_results:
+            # Get the actual text for this entity
+            entity_text = text[result.start:result.end]
 
-            # Use the nlp_configuration directly
-            provider = NlpEngineProvider(nlp_configuration=self.nlp_configuration)
+            # Map Presidio entity type to our categories
+            category = self.ENTITY_TYPE_MAPPING.get(result.entity_type)
 
-            nlp_engine = provider.create_engine()
+            if category:
+                if category not in pii_data:
+                    pii_data[category] = []
 
-            registry = RecognizerRegistry([
-                SpacyRecognizer(supported_entities=["PERSON"], supported_language="en"),
-                EmailRecognizer(),
-                PhoneRecognizer(),
-                CreditCardRecognizer(),
-                UsSsnRecognizer(),
-            ])
-            self.analyzer = AnalyzerEngine(registry=registry, nlp_engine=nlp_engine)
-            LOG.info(f"Initialized with {model_name} model for language {self.language}")
+                # Avoid duplicates
+                if entity_text not in pii_data[category]:
+                    pii_data[category].append(entity_text)
+            else:
+                # Log unmapped entity types for debugging
+                LOG.debug(f"Unmapped Presidio entity type: {result.entity_type}")
 
-            self._initialized = True
+                # Use the entity type as-is with lowercase
+                category = result.entity_type.lower() + "s"
+                if category not in pii_data:
+                    pii_data[category] = []
+                if entity_text not in pii_data[category]:
+                    pii_data[category].append(entity_text)
+
+        return pii_data
 
     def detect_pii(self, text: str, system_prompt: Optional[str] = None) -> Dict[str, List[str]]:
         """Detect PII in text using Presidio.
@@ -98,49 +249,96 @@ class PresidioBackend:
         if not text:
             return {}
 
-        self._ensure_initialized()
+        cache_key = None
+        if self._cache_db is not None:
+            cache_key = self._cache_key(text)
+            cached = self._load_cached([cache_key]).get(cache_key)
+            if cached is not None:
+                return cached
+
+        analyzer = self.analyzer or self._ensure_initialized()
 
         try:
             # Analyze text for PII
-            analyzer_results = self.analyzer.analyze(
+            analyzer_results = analyzer.analyze(
                 text=text,
                 language=self.language,
                 score_threshold=self.confidence_threshold
             )
 
             # Group detected entities by category
-            pii_data = {}
-            for result in analyzer_results:
-                # Get the actual text for this entity
-                entity_text = text[result.start:result.end]
+            pii_data = self._group_results(text, analyzer_results)
 
-                # Map Presidio entity type to our categories
-                category = self.ENTITY_TYPE_MAPPING.get(result.entity_type)
+            LOG.debug(f"Presidio detected PII: {pii_data}")
+            if cache_key is not None:
+                # Committing per text would cost an fsync on every call
+                self._store_cached([(cache_key, pii_data)])
+                if self._uncommitted >= _CACHE_COMMIT_EVERY:
+                    self.flush_cache()
+            return pii_data
 
-                if category:
-                    if category not in pii_data:
-                        pii_data[category] = []
+        except Exception as e:
+            LOG.error(f"Error detecting PII with Presidio: {e}")
+            return {}
+
+    def detect_pii_batch(self, texts: List[str], batch_size: int = 16) -> List[Dict[str, List[str]]]:
+        """Detect PII in several texts with one batched pass through the NLP pipeline.
+
+        spaCy runs the texts through ``nlp.pipe``, which amortizes model overhead
+        across the batch instead of paying it once per text, and spreads them
+        over ``n_process`` worker processes when that is above 1.
+
+        Args:
+            texts: Texts to analyze
+            batch_size: Number of texts spaCy processes together
 
-                    # Avoid duplicates
-                    if entity_text not in pii_data[category]:
-                        pii_data[category].append(entity_text)
+        Returns:
+            One PII dictionary per input text, in input order
+        """
+        results: List[Dict[str, List[str]]] = [{} for _ in texts]
+
+        # Serve cache hits directly and only analyze the misses
+        pending = [(i, text, None) for i, text in enumerate(texts) if text]
+        if self._cache_db is not None and pending:
+            keyed = [(i, text, self._cache_key(text)) for i, text, _ in pending]
+            cached = self._load_cached([key for _, _, key in keyed])
+            pending = []
+            for i, text, key in keyed:
+                if key in cached:
+                    results[i] = cached[key]
                 else:
-                    # Log unmapped entity types for debugging
-                    LOG.debug(f"Unmapped Presidio entity type: {result.entity_type}")
+                    pending.append((i, text, key))
 
-                    # Use the entity type as-is with lowercase
-                    category = result.entity_type.lower() + "s"
-                    if category not in pii_data:
-                        pii_data[category] = []
-                    if entity_text not in pii_data[category]:
-                        pii_data[category].append(entity_text)
+        if not pending:
+            return results
 
-            LOG.debug(f"Presidio detected PII: {pii_data}")
-            return pii_data
+        analyzer = self.analyzer or self._ensure_initialized()
 
+        try:
+            batch_analyzer = BatchAnalyzerEngine(analyzer_engine=analyzer)
+            batch_results = batch_analyzer.analyze_iterator(
+                [text for _, text, _ in pending],
+                language=self.language,
+                batch_size=batch_size,
+                n_process=self.n_process,
+                score_threshold=self.confidence_threshold
+            )
         except Exception as e:
             LOG.error(f"Error detecting PII with Presidio: {e}")
-            return {}
+            return results
+
+        new_entries = []
+        for (i, text, cache_key), analyzer_results in zip(pending, batch_results):
+            pii_data = self._group_results(text, analyzer_results)
+            if cache_key is not None:
+                new_entries.append((cache_key, pii_data))
+            results[i] = pii_data
+        if new_entries:
+            self._store_cached(new_entries)
+            self.flush_cache()
+
+        LOG.debug(f"Presidio batch-analyzed {len(pending)} of {len(texts)} texts")
+        return results
 
     def num_tokens(self, text: str) -> int:
         """Estimate the number of tokens in text.
@@ -2,12 +2,19 @@
 """CLI wrapper to prep submissions and launch Claude Code."""
 
 import argparse
+import importlib
+import os
 import subprocess
 import sys
 import shutil
 from pathlib import Path
-from datetime import datetime
-import importlib.resources
+
+# Console commands that can run inside this interpreter instead of a subprocess
+IN_PROCESS_COMMANDS = {
+    'prep-moodle': 'mira.tools.moodle_prep.cli',
+    'anonymize-dir': 'mira.tools.dir_anonymizer.cli',
+    'update-moodle-grades': 'mira.tools.moodle_prep.update_grades_cli',
+}
 
 
 def main():
@@ -42,6 +49,14 @@ Next steps in Claude Code:
         help='Working directory (will create 0/1/2 subdirectories)'
     )
 
+    parser.add_argument(
+        '--subprocess',
+        dest='in_process',
+        action='store_false',
+        help='Run prep-moodle, anonymize-dir and update-moodle-grades as separate '
+             'processes instead of in-process (slower, but isolates each step)'
+    )
+
     args = parser.parse_args()
 
     # Validate zip file
@@ -62,9 +77,9 @@ Next steps in Claude Code:
     # Step 1: Run prep-moodle
     print("Step 1: Preparing submissions...")
     try:
-        subprocess.run(
+        run_command(
             ['prep-moodle', '--zip', str(args.zip_file), '--workdir', str(args.workdir)],
-            check=True
+            in_process=args.in_process
         )
     except subprocess.CalledProcessError as e:
         print(f"\nError: prep-moodle failed with exit code {e.returncode}", file=sys.stderr)
@@ -122,12 +137,12 @@ Next steps in Claude Code:
         sys.exit(0)
 
     try:
-        subprocess.run([
+        run_command([
             'anonymize-dir', 'restore',
             str(redacted_dir),
             str(final_dir),
             str(mapping_file)
-        ], check=True)
+        ], in_process=args.in_process)
     except subprocess.CalledProcessError as e:
         print(f"\nError: De-anonymization failed with exit code {e.returncode}", file=sys.stderr)
         sys.exit(1)
@@ -140,10 +155,10 @@ Next steps in Claude Code:
     print("=" * 70)
 
     try:
-        subprocess.run([
+        run_command([
             'update-moodle-grades',
             '--restored-dir', str(final_dir)
-        ], check=True)
+        ], in_process=args.in_process)
     except subprocess.CalledProcessError as e:
         print(f"\nWarning: Failed to update moodle_grades.csv (exit code {e.returncode})", file=sys.stderr)
         print("You can manually run: update-moodle-grades --restored-dir " + str(final_dir))
@@ -161,8 +176,32 @@ Next steps in Claude Code:
     print()
 
 
+def run_command(cmd: list, in_process: bool = True):
+    """Run a MIRA console command, raising CalledProcessError on failure.
+
+    Commands listed in IN_PROCESS_COMMANDS are invoked by calling their ``main``
+    directly, which avoids a fresh interpreter start and re-importing heavy
+    dependencies. Anything else falls back to a subprocess.
+    """
+    name, argv = cmd[0], cmd[1:]
+    if not in_process or name not in IN_PROCESS_COMMANDS:
+        subprocess.run(cmd, check=True)
+        return
+
+    entrypoint = importlib.import_module(IN_PROCESS_COMMANDS[name]).main
+    try:
+        entrypoint(argv)
+    except SystemExit as e:
+        if e.code is None or e.code == 0:
+            return
+        returncode = e.code if isinstance(e.code, int) else 1
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
 def copy_readme_template(dest_dir: Path, workdir: Path):
     """Copy and customize CLAUDE.md template to destination."""
+    from datetime import datetime
+
     # Read template
     template_path = Path(__file__).parent / 'templates' / 'CLAUDE_TEMPLATE.md'
 
@@ -172,8 +211,12 @@ def copy_readme_template(dest_dir: Path, workdir: Path):
 
     template_content = template_path.read_text()
 
-    # Count submissions
-    num_submissions = len([d for d in dest_dir.iterdir() if d.is_dir() and not d.name.startswith('.')])
+    # Count submissions; DirEntry.is_dir() reuses readdir's file type, avoiding a stat per entry
+    with os.scandir(dest_dir) as entries:
+        num_submissions = sum(
+            1 for entry in entries
+            if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.')
+        )
 
     # Substitute variables
     claude_content = template_content.format(
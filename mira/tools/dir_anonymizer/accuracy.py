@@ -1,25 +1,34 @@
 """Accuracy testing for PII detection."""
 
-import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
-from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # libyaml not available, use the pure-Python parser
+    from yaml import SafeLoader as YamlLoader
 
-from mira.libs.local_anonymizer import LocalAnonymizer
 from mira.libs.config_loader import ConfigType, get_config
+from mira.libs.local_anonymizer import LocalAnonymizer
 
 
 class AccuracyMetrics:
     """Calculate and report accuracy metrics for PII detection."""
     
-    def calculate_precision_recall_f1(self, expected: List[str], detected: List[str]) -> Dict[str, float]:
-        """Calculate precision, recall, and F1 score for a set of items."""
-        expected_set = set(expected)
-        detected_set = set(detected)
+    def calculate_precision_recall_f1(self, expected: Iterable[str], detected: Iterable[str]) -> Dict[str, float]:
+        """Calculate precision, recall, and F1 score for a set of items.
+
+        Sets are used as-is; any other iterable is converted to a set first.
+        """
+        expected_set = expected if isinstance(expected, (set, frozenset)) else set(expected)
+        detected_set = detected if isinstance(detected, (set, frozenset)) else set(detected)
         
         true_positives = len(expected_set & detected_set)
-        false_positives = len(detected_set - expected_set)
-        false_negatives = len(expected_set - detected_set)
+        false_positives = len(detected_set) - true_positives
+        false_negatives = len(expected_set) - true_positives
         
         # Calculate metrics
         precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0.0
@@ -45,9 +54,24 @@ class AccuracyMetrics:
         lines.append("=" * 70)
         lines.append("")
         
+        # Single pass: normalize each result into an (expected, detected, passed)
+        # tuple grouped by category, and collect failures per category alongside
+        by_category: Dict[str, List[tuple]] = {}
+        failures_by_category: Dict[str, List[Dict[str, Any]]] = {}
+        passed = 0
+        for result in results:
+            category = result.get('category', 'uncategorized')
+            result_passed = bool(result.get('passed', False))
+            by_category.setdefault(category, []).append(
+                (result.get('expected') or {}, result.get('detected') or {}, result_passed)
+            )
+            if result_passed:
+                passed += 1
+            else:
+                failures_by_category.setdefault(category, []).append(result)
+
         # Overall statistics
         total = len(results)
-        passed = sum(1 for r in results if r.get('passed', False))
         failed = total - passed
         
         lines.append("OVERALL STATISTICS")
@@ -59,12 +83,6 @@ class AccuracyMetrics:
             lines.append(f"Success Rate: {passed/total:.1%}")
         lines.append("")
         
-        # Group by category
-        by_category = defaultdict(list)
-        for result in results:
-            category = result.get('category', 'uncategorized')
-            by_category[category].append(result)
-        
         # Category statistics
         lines.append("BY CATEGORY")
         lines.append("-" * 40)
@@ -74,7 +92,7 @@ class AccuracyMetrics:
         for category in sorted(by_category.keys()):
             cat_results = by_category[category]
             cat_total = len(cat_results)
-            cat_passed = sum(1 for r in cat_results if r.get('passed', False))
+            cat_passed = sum(1 for _, _, result_passed in cat_results if result_passed)
             cat_failed = cat_total - cat_passed
             
             lines.append(f"\n{category.upper()}:")
@@ -83,18 +101,15 @@ class AccuracyMetrics:
             lines.append(f"  Failed: {cat_failed}")
             lines.append(f"  Success Rate: {cat_passed/cat_total:.1%}" if cat_total > 0 else "  Success Rate: N/A")
             
-            # Calculate precision/recall for this category
-            all_expected = []
-            all_detected = []
+            # Calculate precision/recall for this category; the metrics only
+            # depend on the distinct PII strings, so accumulate sets directly
+            all_expected = set()
+            all_detected = set()
 
-            for result in cat_results:
-                # Extract values from the flat dict format
-                expected_dict = result.get('expected', {})
-                detected_dict = result.get('detected', {})
-
-                # Collect all values (the actual PII strings)
-                all_expected.extend(expected_dict.values())
-                all_detected.extend(detected_dict.values())
+            for expected_dict, detected_dict, _ in cat_results:
+                # Collect all values (the actual PII strings) from the flat dicts
+                all_expected.update(expected_dict.values())
+                all_detected.update(detected_dict.values())
 
             if all_expected or all_detected:
                 metrics = self.calculate_precision_recall_f1(all_expected, all_detected)
@@ -104,18 +119,12 @@ class AccuracyMetrics:
                 category_metrics[category] = metrics
         
         # Failed test details
-        failed_tests = [r for r in results if not r.get('passed', False)]
-        if failed_tests:
+        if failures_by_category:
             lines.append("")
             lines.append("=" * 70)
             lines.append("FAILED TESTS")
             lines.append("-" * 40)
             
-            # Group failures by category
-            failures_by_category = defaultdict(list)
-            for failure in failed_tests:
-                failures_by_category[failure.get('category', 'uncategorized')].append(failure)
-            
             for category in sorted(failures_by_category.keys()):
                 lines.append(f"\n{category.upper()}:")
                 for failure in failures_by_category[category][:5]:  # Show first 5 failures per category
@@ -186,18 +195,23 @@ class AccuracyTester:
         
         # Load all .yaml files, sorted for consistent ordering
         yaml_files = sorted(self.test_dir.glob("*.yaml"))
-        
-        for yaml_file in yaml_files:
-            with open(yaml_file) as f:
-                data = yaml.safe_load(f)
+        if not yaml_files:
+            return all_test_cases
 
-                if not data or 'test_cases' not in data:
-                    continue
+        # Parse files concurrently; map() keeps results in file order
+        with ThreadPoolExecutor(max_workers=min(8, len(yaml_files))) as executor:
+            parsed = list(executor.map(
+                lambda path: yaml.load(path.read_text(), Loader=YamlLoader), yaml_files
+            ))
 
-                # Add source file info to each test case
-                for case in data['test_cases']:
-                    case['source_file'] = yaml_file.name
-                    all_test_cases.append(case)
+        for yaml_file, data in zip(yaml_files, parsed):
+            if not data or 'test_cases' not in data:
+                continue
+
+            # Add source file info to each test case
+            for case in data['test_cases']:
+                case['source_file'] = yaml_file.name
+                all_test_cases.append(case)
 
         return all_test_cases
     
@@ -211,14 +225,17 @@ class AccuracyTester:
         # {'REDACTED_EMAIL1': 'john@example.com', 'REDACTED_PERSON1': 'John Doe'}
         return mappings
     
-    def validate_detection(self, expected: Dict, detected: Dict, test_case: Dict) -> List[str]:
+    def validate_detection(self, expected: Dict, detected: Dict, test_case: Dict,
+                           tags: frozenset = None) -> List[str]:
         """Validate detected PII against expected.
 
         Compare only the values (actual PII strings), ignoring the REDACTED_* keys.
         This makes the comparison invariant to order and category differences.
+        Callers that already built the test case's tag set can pass it as ``tags``.
         """
         errors = []
-        tags = test_case.get('tags', [])
+        if tags is None:
+            tags = frozenset(test_case.get('tags', ()))
 
         # For false positive tests, nothing should be detected
         if 'false_positive' in tags:
@@ -233,21 +250,28 @@ class AccuracyTester:
 
         # Check for missing detections
         missing = expected_values - detected_values
-        for value in missing:
-            errors.append(f"Not detected: '{value}'")
+        errors.extend(f"Not detected: '{value}'" for value in sorted(missing))
 
         # Check for extra detections
         extra = detected_values - expected_values
-        for value in extra:
+        if extra:
             category = test_case.get('category', 'unknown')
-            errors.append(f"Unexpected detection ({category}): '{value}'")
+            errors.extend(f"Unexpected detection ({category}): '{value}'" for value in sorted(extra))
         
         return errors
     
-    def run_test(self, test_case: Dict) -> Dict[str, Any]:
-        """Run a single test case."""
+    def run_test(self, test_case: Dict, pii_data: Dict[str, List[str]] = None) -> Dict[str, Any]:
+        """Run a single test case.
+
+        Args:
+            test_case: Test case loaded from YAML
+            pii_data: Detections for the test input computed ahead of time (e.g. by
+                a batched call); detected on the spot when omitted
+        """
+        tags = frozenset(test_case.get('tags', ()))
+
         # Skip tests with skip tag
-        if 'skip' in test_case.get('tags', []):
+        if 'skip' in tags:
             return {
                 'id': test_case['id'],
                 'category': test_case.get('category', 'uncategorized'),
@@ -263,11 +287,14 @@ class AccuracyTester:
         self.anonymizer.reset()
 
         # Use the shared anonymizer instance
-        anon_text, mappings = self.anonymizer.anonymize_data(test_case['input'])
+        if pii_data is None:
+            anon_text, mappings = self.anonymizer.anonymize_data(test_case['input'])
+        else:
+            anon_text, mappings = self.anonymizer.replace_pii(test_case['input'], pii_data)
         detected = self.extract_detected_pii(mappings)
         expected = test_case.get('expected', {})
 
-        errors = self.validate_detection(expected, detected, test_case)
+        errors = self.validate_detection(expected, detected, test_case, tags)
 
         return {
             'id': test_case['id'],
@@ -289,9 +316,15 @@ class AccuracyTester:
         
         print(f"Running {len(test_cases)} test cases...")
         results = []
-        
-        for test_case in test_cases:
-            result = self.run_test(test_case)
+
+        # Detect PII for all runnable inputs in one batch; detection does not
+        # depend on anonymizer state, so per-test resets still apply afterwards
+        runnable = [i for i, tc in enumerate(test_cases) if 'skip' not in tc.get('tags', [])]
+        detections = self.anonymizer.detect_pii_batch([test_cases[i]['input'] for i in runnable])
+        detections_by_index = dict(zip(runnable, detections))
+
+        for i, test_case in enumerate(test_cases):
+            result = self.run_test(test_case, detections_by_index.get(i))
             results.append(result)
             
             # Show progress
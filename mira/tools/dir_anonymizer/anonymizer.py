@@ -1,21 +1,74 @@
 """Directory anonymizer using local LLM."""
 
 import os
+import re
 import sys
 import json
+import hashlib
 import shutil
 import logging
+import threading
+from collections import Counter, OrderedDict
+from itertools import groupby, islice
+from concurrent.futures import Executor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
-from fnmatch import fnmatch
+from fnmatch import translate
 from tqdm import tqdm
 
+try:
+    import orjson
+except ImportError:  # optional speedup, fall back to the standard library json
+    orjson = None
+
 from mira.libs.config_loader import ConfigType, get_config
 from mira.libs.local_anonymizer import LocalAnonymizer
 
 logging.basicConfig(level=logging.INFO)
 LOG = logging.getLogger(__name__)
 
+# Moodle submission directories: "Name_ID_assignsubmission_file"
+_MOODLE_RE = re.compile(r'^(.+?)_(\d+)_(assignsubmission_\w+)$')
+# Filename probe for options.skip_unmarked_filenames: a capital letter, '@', a 3+ digit
+# run or a URL marker. Lowercase names like "main_utils" or "hw1" then skip detection,
+# but so does "john_smith_hw1" although spaCy and the LLM backend can flag it, so
+# skipping is opt-in.
+_NAMELIKE_RE = re.compile(r'[A-Z]|@|\d{3}|://|www\.')
+# Default content probe for options.skip_unmarked_content: capitals, '@' (emails),
+# digits (phones, SSNs, IPs, card numbers) or URL markers. This is NOT a superset of
+# what detection finds: spaCy NER and the LLM backend can flag lowercase names such as
+# "john smith", which the probe misses, so skipping is opt-in.
+_PII_PROBE_PATTERN = r'[A-Z@\d]|://|www\.'
+# Compression suffixes that are kept together with the extension before them
+_COMPRESSION_EXTS = frozenset({'.gz', '.bz2', '.xz'})
+# Number of top-level directories above which they are scanned in parallel
+_PARALLEL_SCAN_MIN_DIRS = 4
+# Write buffer for streamed outputs, which are written in many small pieces
+_WRITE_BUFFER_SIZE = 1 << 20
+# Placeholder returned by _read_batch for files too large to read in one go
+_STREAM = object()
+# Characters of anonymized content kept for reuse by identical files
+_CONTENT_CACHE_CHARS = 32 * 1024 * 1024
+# Entity type in a redaction token, e.g. REDACTED_PERSON1 -> PERSON
+_TOKEN_TYPE_RE = re.compile(r'REDACTED_([A-Z]+)\d*')
+
+
+def _split_extension(filename: str, is_directory: bool) -> Tuple[str, str]:
+    """Split a filename into (base name, extension); directories have no extension."""
+    if is_directory:
+        return filename, ''
+    base_name, ext = os.path.splitext(filename)
+    # Keep compound extensions like .tar.gz together
+    if ext.lower() in _COMPRESSION_EXTS and '.' in base_name:
+        base_name, inner_ext = os.path.splitext(base_name)
+        ext = inner_ext + ext
+    return base_name, ext
+
+
+def _tmp_path(path: Path) -> Path:
+    """Return the temporary sibling a file is written to before being renamed into place."""
+    return path.with_name(path.name + '.tmp')
+
 
 class DirectoryAnonymizer:
     """Anonymize directory contents and optionally filenames."""
@@ -38,11 +91,55 @@ class DirectoryAnonymizer:
         self.anonymizer = LocalAnonymizer.create_from_config(self.anon_config)
         LOG.info("Using local LLM anonymizer")
 
+        # Allowed extensions and exclude globs, compiled once for per-file filtering
+        self._allowed_exts = frozenset(ft.lower() for ft in self.anon_config.get('file_types', []))
+        exclude_patterns = self.anon_config.get('exclude_patterns', [])
+        self._exclude_re = (
+            re.compile('|'.join(f'(?:{translate(p)})' for p in exclude_patterns))
+            if exclude_patterns else None
+        )
+
+        # Output and batching options, read once rather than per file
+        self._default_output_dir = get_config('output.output_dir', self.anon_config, 'anonymized_output')
+        self._mapping_filename = Path(
+            get_config('output.mapping_file', self.anon_config, 'anonymization_mapping.json')
+        ).name
+        self._create_report = get_config('options.create_report', self.anon_config, True)
+        self._batch_size = max(1, get_config('options.content_batch_size', self.anon_config, 16))
+        # Files larger than this are anonymized in line chunks instead of read whole
+        self._stream_threshold = get_config('options.stream_threshold_bytes', self.anon_config, 1_000_000)
+
+        # Opt-in: contents with no match for the probe skip detection and pass through
+        # unchanged, at the risk of leaking PII the probe cannot see (lowercase names)
+        self._pii_probe = None
+        if get_config('options.skip_unmarked_content', self.anon_config, False):
+            pii_probe = get_config('options.pii_probe_regex', self.anon_config, _PII_PROBE_PATTERN)
+            self._pii_probe = re.compile(pii_probe) if pii_probe else None
+        # Opt-in, with the same risk: names without _NAMELIKE_RE markers skip detection
+        self._skip_unmarked_filenames = get_config('options.skip_unmarked_filenames', self.anon_config, False)
+
+        # Filename base -> anonymize_data() result for it
+        self._filename_cache = {}
+
+        # Output directories already created, to skip repeated mkdir calls
+        self._dirs_created = set()
+
+        # LRU of anonymized (content, mappings) keyed by a digest of the original bytes,
+        # bounded by the total characters held in _content_cache_chars
+        self._content_cache = OrderedDict()
+        self._content_cache_chars = 0
+
+        # Guards statistics updated from the background writer and scanner threads
+        self._stats_lock = threading.Lock()
+
+        # Reason -> number of paths skipped while gathering, logged as one summary
+        self._skip_counts = Counter()
+
         # Initialize Moodle grades handler lazily to avoid circular import
         self.moodle_grades_handler = None
 
         # Cache for anonymized paths to ensure consistency
-        # Maps original relative path -> anonymized relative path
+        # Maps original relative path parts -> tuple of anonymized path components
         self.path_cache = {}
 
         # Track all mappings - unified for both paths and content
@@ -56,48 +153,53 @@ class DirectoryAnonymizer:
             }
         }
         
-    def should_process_file(self, file_path: Path) -> bool:
+    def should_process_file(self, file_path: str) -> bool:
         """Check if a file should be processed based on config.
         
         Args:
-            file_path: Path to the file
+            file_path: Path to the file, as a string
             
         Returns:
             True if file should be processed
         """
+        return self._should_process(file_path, os.path.basename(file_path))
+
+    def _should_process(self, file_path: str, name: str) -> bool:
+        """should_process_file() for callers that already have the file's name."""
         # Special case: Always process moodle_grades.csv
-        if file_path.name == 'moodle_grades.csv':
+        if name == 'moodle_grades.csv':
             return True
 
         # Check if file extension is in allowed types
-        file_types = self.anon_config.get('file_types', [])
-        if not any(file_path.suffix.lower() == ft.lower() for ft in file_types):
-            LOG.warning(f"Skipping file (not in allowed types): {file_path}")
+        if os.path.splitext(name)[1].lower() not in self._allowed_exts:
+            self._count_skip('file (not in allowed types)', file_path)
             return False
             
         # Check against exclude patterns
-        exclude_patterns = self.anon_config.get('exclude_patterns', [])
-        for pattern in exclude_patterns:
-            if fnmatch(str(file_path), pattern) or fnmatch(file_path.name, pattern):
-                LOG.warning(f"Skipping file (matches exclude pattern '{pattern}'): {file_path}")
-                return False
+        if self._exclude_re is not None and (
+            self._exclude_re.match(file_path) or self._exclude_re.match(name)
+        ):
+            self._count_skip('file (matches exclude pattern)', file_path)
+            return False
                 
         return True
         
-    def should_exclude_dir(self, dir_path: Path) -> bool:
+    def _count_skip(self, reason: str, path: str) -> None:
+        """Tally a skipped path; gather_files_to_process logs the totals once."""
+        LOG.debug("Skipping %s: %s", reason, path)
+        with self._stats_lock:
+            self._skip_counts[reason] += 1
+
+    def should_exclude_dir(self, dir_name: str) -> bool:
         """Check if a directory should be excluded.
         
         Args:
-            dir_path: Path to the directory
+            dir_name: Name of the directory (final path component)
             
         Returns:
             True if directory should be excluded
         """
-        exclude_patterns = self.anon_config.get('exclude_patterns', [])
-        for pattern in exclude_patterns:
-            if fnmatch(dir_path.name, pattern):
-                return True
-        return False
+        return self._exclude_re is not None and self._exclude_re.match(dir_name) is not None
         
     def is_moodle_submission(self, filename: str) -> bool:
         """Check if a filename matches the Moodle submission pattern.
@@ -110,9 +212,7 @@ class DirectoryAnonymizer:
         Returns:
             True if this matches a Moodle submission pattern
         """
-        import re
-        moodle_pattern = r'^(.+?)_(\d+)_(assignsubmission_\w+)$'
-        return bool(re.match(moodle_pattern, filename))
+        return _MOODLE_RE.match(filename) is not None
     
     def anonymize_moodle_submission(self, filename: str) -> Tuple[str, Dict[str, str]]:
         """Anonymize a Moodle submission directory name.
@@ -126,9 +226,7 @@ class DirectoryAnonymizer:
         Returns:
             Tuple of (anonymized directory name, mappings dict)
         """
-        import re
-        moodle_pattern = r'^(.+?)_(\d+)_(assignsubmission_\w+)$'
-        match = re.match(moodle_pattern, filename)
+        match = _MOODLE_RE.match(filename)
 
         if not match:
             # Shouldn't happen if is_moodle_submission was called first
@@ -139,7 +237,7 @@ class DirectoryAnonymizer:
         suffix_part = match.group(3)
 
         # Try to anonymize using LLM first, which will use entity memory
-        anonymized_name, mappings = self.anonymizer.anonymize_data(name_part)
+        anonymized_name, mappings = self._anonymize_base(name_part)
 
         # If LLM didn't detect it as a name, force anonymization
         # since we know this position contains a student name in Moodle format
@@ -171,7 +269,7 @@ class DirectoryAnonymizer:
         
         Args:
             filename: Original filename
-            is_directory: Whether this is a directory name (unused but kept for compatibility)
+            is_directory: Whether this is a directory name, which has no extension to keep
 
         Returns:
             Tuple of (anonymized filename, mappings dict)
@@ -184,26 +282,73 @@ class DirectoryAnonymizer:
         if self.is_moodle_submission(filename):
             return self.anonymize_moodle_submission(filename)
         
-        # Separate the extension from the base name for files
-        path = Path(filename)
-        if not is_directory and path.suffix:
-            # Get all extensions (handles cases like .tar.gz)
-            ext = ''.join(path.suffixes)
-            base_name = str(path).replace(ext, '')
-        else:
-            ext = ''
-            base_name = filename
-        
+        base_name, ext = _split_extension(filename, is_directory)
+
+        if not self._filename_may_contain_pii(base_name):
+            return filename, {}
+
         # Use the LLM to anonymize the base name
         # The LLM will detect names, emails, phones, etc. and replace with standard tokens
-        anonymized_base, mappings = self.anonymizer.anonymize_data(base_name)
-        anonymized_filename = anonymized_base.strip()
-        if ext:
-            anonymized_filename += ext
+        anonymized_base, mappings = self._anonymize_base(base_name)
+        anonymized_filename = anonymized_base.strip() + ext
 
         # mappings is now a flat dict: token -> original
         return anonymized_filename, mappings
-        
+
+    def _anonymize_base(self, base_name: str) -> Tuple[str, Dict[str, str]]:
+        """Run anonymize_data on a filename base, caching the result.
+
+        Base names repeat across submissions (e.g. "Assignment1"); entity memory
+        would give the same tags on a second call, so the cache is exact.
+        """
+        cached = self._filename_cache.get(base_name)
+        if cached is None:
+            cached = self._filename_cache[base_name] = self.anonymizer.anonymize_data(base_name)
+        return cached
+
+    def _detection_input(self, filename: str, is_directory: bool) -> Optional[str]:
+        """Return the text anonymize_filename() would send for detection, if any."""
+        if filename == 'moodle_grades.csv':
+            return None
+        match = _MOODLE_RE.match(filename)
+        if match:
+            return match.group(1)
+        base_name, _ = _split_extension(filename, is_directory)
+        return base_name if self._filename_may_contain_pii(base_name) else None
+
+    def _filename_may_contain_pii(self, base_name: str) -> bool:
+        """False only if skip_unmarked_filenames is enabled and the name has no PII markers."""
+        return not self._skip_unmarked_filenames or _NAMELIKE_RE.search(base_name) is not None
+
+    def prefetch_filenames(self, files_to_process: List[Path], input_path: Path) -> None:
+        """Detect PII in every distinct path component with one batched call.
+
+        Fills the filename cache so anonymizing paths afterwards is mostly
+        lookups. Components are collected in processing order, so entity tags
+        are still assigned deterministically.
+
+        Args:
+            files_to_process: Files that will be processed, in order
+            input_path: Root of the input tree
+        """
+        bases = {}  # Ordered set of names needing detection
+        for file_path in files_to_process:
+            parts = file_path.relative_to(input_path).parts
+            last = len(parts) - 1
+            for i, part in enumerate(parts):
+                base_name = self._detection_input(part, is_directory=i < last)
+                if base_name is not None and base_name not in self._filename_cache:
+                    bases[base_name] = None
+        if not bases:
+            return
+
+        try:
+            results = self.anonymizer.anonymize_data_batch(list(bases))
+        except Exception as e:
+            LOG.warning(f"Batched filename anonymization failed, falling back to per-name calls: {e}")
+            return
+        self._filename_cache.update(zip(bases, results))
+
     def anonymize_file_content(self, file_path: Path) -> Tuple[str, Dict[str, str]]:
         """Anonymize the content of a single file.
 
@@ -224,8 +369,9 @@ class DirectoryAnonymizer:
                 return self.moodle_grades_handler.anonymize_moodle_grades(file_path)
 
             # Default LLM-based anonymization for other files
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            content = self._read_content(file_path)
+            if not self._may_contain_pii(content):
+                return content, {}
 
             # Returns flat dict: token -> original
             anonymized_content, mappings = self.anonymizer.anonymize_data(content)
@@ -253,88 +399,326 @@ class DirectoryAnonymizer:
             
         # Determine output directory
         if output_dir is None:
-            output_dir = self.anon_config['output']['output_dir']
+            output_dir = self._default_output_dir
         output_path = Path(output_dir).resolve()
 
         # Collect all files to process
         files_to_process = self.gather_files_to_process(input_path)
         self.all_mappings['statistics']['total_files'] = len(files_to_process)
 
-        # Process files with progress bar
-        with tqdm(total=len(files_to_process), desc="Anonymizing files") as pbar:
-            for file_path in files_to_process:
-                try:
-                    self.anonymize_one_file(file_path, input_path, output_path)
-                except Exception as e:
-                    LOG.error(f"Error processing {file_path}: {e}")
-                    self.all_mappings['statistics']['errors'].append({
-                        'file': str(file_path),
-                        'error': str(e)
-                    })
-                    self.all_mappings['statistics']['skipped_files'] += 1
-                    
-                pbar.update(1)
-                
+        try:
+            # Detect PII in all distinct file and directory names up front, in one batch
+            if self.anonymize_filenames:
+                self.prefetch_filenames(files_to_process, input_path)
+
+            # Process files in batches so PII detection runs over several files at once.
+            # A small I/O pool reads the next batch and writes finished files while the
+            # main thread runs detection; all anonymizer state stays on the main thread.
+            batch_size = self._batch_size
+            batches = [files_to_process[i:i + batch_size] for i in range(0, len(files_to_process), batch_size)]
+            with ThreadPoolExecutor(max_workers=2) as io_pool, \
+                    tqdm(total=len(files_to_process), desc="Anonymizing files", mininterval=0.5) as pbar:
+                next_read = io_pool.submit(self._read_batch, batches[0]) if batches else None
+                for i, batch in enumerate(batches):
+                    contents = next_read.result()
+                    if i + 1 < len(batches):
+                        next_read = io_pool.submit(self._read_batch, batches[i + 1])
+                    self.anonymize_files(batch, input_path, output_path, contents=contents, io_pool=io_pool)
+                    pbar.update(len(batch))
+        finally:
+            # Commit and close the detection cache once the run's detection is done
+            self.anonymizer.close()
+
         # Save mapping file to output directory
-        mapping_filename = Path(self.anon_config['output']['mapping_file']).name
-        mapping_file = output_path / mapping_filename
-        with open(mapping_file, 'w') as f:
-            json.dump(self.all_mappings, f, indent=2)
+        output_path.mkdir(parents=True, exist_ok=True)
+        mapping_file = output_path / self._mapping_filename
+        self.write_mapping_file(mapping_file)
         LOG.info(f"Anonymization complete. Mapping saved to {mapping_file}")
         
         # Create report if requested
-        if self.anon_config['options']['create_report']:
+        if self._create_report:
             self.create_report(output_path)
             
         return self.all_mappings
 
-    def anonymize_one_file(self, file_path, input_path, output_path):
-        # Determine output file path and create it
-        rel_path = file_path.relative_to(input_path)
-        if self.anonymize_filenames:
-            out_rel_path = self.anonymize_file_path(file_path, rel_path)
+    def _add_mappings(self, mappings: Dict[str, str]) -> None:
+        """Add token -> original mappings to the run's mapping table."""
+        if mappings:
+            self.all_mappings['mappings'].update(mappings)
+
+    def write_mapping_file(self, mapping_file: Path) -> None:
+        """Write all mappings and statistics as indented UTF-8 JSON.
+
+        Uses orjson when available, which serializes large mapping dicts
+        several times faster than the standard library. The file is written
+        to a temporary name and moved into place, so an interrupted write
+        never leaves a truncated mapping file behind.
+
+        Args:
+            mapping_file: Path to write the mapping file to
+        """
+        if orjson is not None:
+            data = orjson.dumps(self.all_mappings, option=orjson.OPT_INDENT_2)
         else:
-            out_rel_path = rel_path
-        out_file_path = output_path / out_rel_path
-        out_file_path.parent.mkdir(parents=True, exist_ok=True)
+            data = json.dumps(self.all_mappings, indent=2, ensure_ascii=False).encode('utf-8')
+        tmp_path = _tmp_path(mapping_file)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, mapping_file)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def anonymize_one_file(self, file_path, input_path, output_path):
+        out_file_path = self._output_path(file_path, input_path, output_path)
 
         # Anonymize content
         anon_content, content_mappings = self.anonymize_file_content(file_path)
-        with open(out_file_path, 'w', encoding='utf-8') as f:
-            f.write(anon_content)
-
-        # Add content mappings to unified mappings
         # content_mappings is now a flat dict: token -> original
-        self.all_mappings['mappings'].update(content_mappings)
-        self.all_mappings['statistics']['processed_files'] += 1
+        self._add_mappings(content_mappings)
+        self._save_output(file_path, out_file_path, anon_content)
+
+    def anonymize_files(self, file_paths: List[Path], input_path: Path, output_path: Path,
+                        contents: Optional[List[Any]] = None,
+                        io_pool: Optional[Executor] = None) -> None:
+        """Anonymize a batch of files, detecting PII in all of their contents at once.
+
+        Output paths are resolved in order first, so filename tags are assigned
+        deterministically; the contents then go through the anonymizer as a
+        single batch. Failures are recorded per file.
+
+        Args:
+            file_paths: Files to anonymize, in processing order
+            input_path: Root of the input tree
+            output_path: Root of the output tree
+            contents: Prefetched result of _read_batch(file_paths), read inline if None
+            io_pool: Executor to hand output writes to; written inline if None
+        """
+        if contents is None:
+            contents = self._read_batch(file_paths)
+
+        pending = []
+        # Files arrive sorted, so siblings are adjacent: resolve each output directory once
+        for parent, group in groupby(zip(file_paths, contents), key=lambda item: item[0].parent):
+            out_dir = None
+            for file_path, content in group:
+                try:
+                    if file_path.name == 'moodle_grades.csv':
+                        # Uses its own column-based handler rather than PII detection
+                        self.anonymize_one_file(file_path, input_path, output_path)
+                        continue
+                    if isinstance(content, Exception):
+                        raise content
+                    if out_dir is None:
+                        out_dir = self._output_dir(parent, input_path, output_path)
+                    out_file_path = out_dir / self._output_name(file_path.name)
+                    if content is _STREAM:
+                        content_mappings = self.anonymize_file_content_streaming(file_path, out_file_path)
+                        self._add_mappings(content_mappings)
+                        with self._stats_lock:
+                            self.all_mappings['statistics']['processed_files'] += 1
+                        continue
+                    digest, text = content
+                    pending.append((file_path, out_file_path, digest, text))
+                except Exception as e:
+                    self._record_error(file_path, e)
+
+        if not pending:
+            return
+
+        # Identical contents (shared templates, resubmitted files) are anonymized once.
+        # Entity memory only grows, so a repeat would produce exactly the cached result.
+        results = {}
+        to_anonymize = {}
+        for file_path, out_file_path, digest, content in pending:
+            if digest in results or digest in to_anonymize:
+                continue
+            cached = self._content_cache.get(digest)
+            if cached is not None:
+                self._content_cache.move_to_end(digest)
+                results[digest] = cached
+            elif self._may_contain_pii(content):
+                to_anonymize[digest] = content
+            else:
+                # Nothing to detect: the file passes through unchanged and needs no caching
+                results[digest] = (content, {})
+
+        if to_anonymize:
+            try:
+                anonymized = self.anonymizer.anonymize_data_batch(list(to_anonymize.values()))
+            except Exception as e:
+                for file_path, _, digest, _ in pending:
+                    if digest in to_anonymize:
+                        self._record_error(file_path, e)
+            else:
+                for digest, result in zip(to_anonymize, anonymized):
+                    results[digest] = result
+                    self._cache_content(digest, result)
+
+        for file_path, out_file_path, digest, _ in pending:
+            if digest not in results:
+                continue  # Anonymization failed; error already recorded
+            anon_content, content_mappings = results[digest]
+            self._add_mappings(content_mappings)
+            if io_pool is not None:
+                io_pool.submit(self._save_output, file_path, out_file_path, anon_content)
+            else:
+                self._save_output(file_path, out_file_path, anon_content)
+
+    def _cache_content(self, digest: bytes, result: Tuple[str, Dict[str, str]]) -> None:
+        """Remember an anonymized result, evicting the least recently used past the size budget."""
+        size = len(result[0])
+        if size > _CONTENT_CACHE_CHARS:
+            return
+        self._content_cache[digest] = result
+        self._content_cache_chars += size
+        while self._content_cache_chars > _CONTENT_CACHE_CHARS:
+            _, (evicted, _) = self._content_cache.popitem(last=False)
+            self._content_cache_chars -= len(evicted)
+
+    def _may_contain_pii(self, content: str) -> bool:
+        """Cheap pre-check: False if skipping is enabled and the probe finds no PII markers."""
+        return self._pii_probe is None or self._pii_probe.search(content) is not None
+
+    def _output_path(self, file_path: Path, input_path: Path, output_path: Path) -> Path:
+        """Determine the output path for a file and create its parent directory."""
+        return self._output_dir(file_path.parent, input_path, output_path) / self._output_name(file_path.name)
+
+    def _output_dir(self, dir_path: Path, input_path: Path, output_path: Path) -> Path:
+        """Determine (and create) the output directory for an input directory."""
+        rel_parts = dir_path.relative_to(input_path).parts
+        if self.anonymize_filenames:
+            rel_parts = self._anonymize_parent(rel_parts)
+        out_dir = output_path.joinpath(*rel_parts)
+        if out_dir not in self._dirs_created:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            self._dirs_created.add(out_dir)
+        return out_dir
+
+    def _output_name(self, filename: str) -> str:
+        """Anonymize a file's name if filename anonymization is enabled."""
+        if not self.anonymize_filenames:
+            return filename
+        anon_name, mappings = self.anonymize_filename(filename)
+        self._add_mappings(mappings)
+        return anon_name
+
+    def _read_content(self, file_path: Path) -> str:
+        """Read a file as text, ignoring undecodable bytes."""
+        return file_path.read_bytes().decode('utf-8', errors='ignore')
+
+    def _read_batch(self, file_paths: List[Path]) -> List[Any]:
+        """Read a batch of files, returning each content or the exception raised.
+
+        Readable files yield (digest, text), the digest taken over the raw bytes.
+        moodle_grades.csv is left to its own handler and yields None; files over
+        the streaming threshold yield _STREAM and are read later in chunks.
+        """
+        contents = []
+        for file_path in file_paths:
+            if file_path.name == 'moodle_grades.csv':
+                contents.append(None)
+                continue
+            try:
+                if os.path.getsize(file_path) > self._stream_threshold:
+                    contents.append(_STREAM)
+                else:
+                    data = file_path.read_bytes()
+                    digest = hashlib.blake2b(data, digest_size=16).digest()
+                    contents.append((digest, data.decode('utf-8', errors='ignore')))
+            except Exception as e:
+                contents.append(e)
+        return contents
+
+    def anonymize_file_content_streaming(self, file_path: Path, out_file_path: Path,
+                                         chunk_lines: int = 200) -> Dict[str, str]:
+        """Anonymize a large file in chunks of lines, writing output as it goes.
+
+        Memory stays proportional to a few chunks rather than the whole file.
+        Chunks go through the anonymizer in batches and share its entity memory,
+        so tags stay consistent with the rest of the run.
+
+        Args:
+            file_path: Path to the input file
+            out_file_path: Path to write the anonymized file to
+            chunk_lines: Number of lines per chunk
+
+        Returns:
+            Flat mappings dict (token -> original) for the whole file
+        """
+        batch_size = self._batch_size
+        mappings = {}
+        tmp_path = _tmp_path(out_file_path)
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore', newline='') as src, \
+                    open(tmp_path, 'w', encoding='utf-8', newline='', buffering=_WRITE_BUFFER_SIZE) as dst:
+                chunks = iter(lambda: ''.join(islice(src, chunk_lines)), '')
+                for batch in iter(lambda: list(islice(chunks, batch_size)), []):
+                    for anon_chunk, chunk_mappings in self.anonymizer.anonymize_data_batch(batch):
+                        dst.write(anon_chunk)
+                        mappings.update(chunk_mappings)
+            os.replace(tmp_path, out_file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return mappings
+
+    def _save_output(self, file_path: Path, out_file_path: Path, anon_content: str) -> None:
+        """Write anonymized content, recording success or failure in the statistics."""
+        # Encode once and write in a single call to a temporary file, then rename
+        # so an interrupted run never leaves a truncated output behind
+        tmp_path = _tmp_path(out_file_path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(anon_content.encode('utf-8'))
+            os.replace(tmp_path, out_file_path)
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            self._record_error(file_path, e)
+            return
+        with self._stats_lock:
+            self.all_mappings['statistics']['processed_files'] += 1
+
+    def _record_error(self, file_path: Path, error: Exception) -> None:
+        """Record a file that could not be anonymized."""
+        LOG.error(f"Error processing {file_path}: {error}")
+        with self._stats_lock:
+            self.all_mappings['statistics']['errors'].append({
+                'file': str(file_path),
+                'error': str(error)
+            })
+            self.all_mappings['statistics']['skipped_files'] += 1
 
     def gather_files_to_process(self, input_path):
-        files_to_process = []
+        self._skip_counts.clear()
         moodle_csv_path = None
+        top_level_csv = os.path.join(str(input_path), 'moodle_grades.csv')
+
+        # Scan top-level subtrees concurrently when there are several of them
+        # (e.g. one per Moodle submission); os.scandir releases the GIL.
+        top_files, subdirs = self._scan_dir(str(input_path))
+        paths = list(top_files)
+        if len(subdirs) > _PARALLEL_SCAN_MIN_DIRS:
+            with ThreadPoolExecutor(max_workers=min(8, len(subdirs))) as pool:
+                for subtree in pool.map(self._gather_subtree, subdirs):
+                    paths.extend(subtree)
+        else:
+            for subdir in subdirs:
+                paths.extend(self._gather_subtree(subdir))
 
-        for root, dirs, files in os.walk(input_path):
-            root_path = Path(root)
-
-            # Filter out excluded directories
-            excluded_dirs = []
-            for d in dirs:
-                if self.should_exclude_dir(root_path / d):
-                    LOG.warning(f"Skipping directory (matches exclude pattern): {root_path / d}")
-                    excluded_dirs.append(d)
-            dirs[:] = [d for d in dirs if d not in excluded_dirs]
-
-            for file in files:
-                file_path = root_path / file
-                if self.should_process_file(file_path):
-                    # Check if this is moodle_grades.csv
-                    if file == 'moodle_grades.csv' and root_path == input_path:
-                        moodle_csv_path = file_path
-                    else:
-                        files_to_process.append(file_path)
+        # Check if this is moodle_grades.csv
+        if top_level_csv in paths:
+            paths.remove(top_level_csv)
+            moodle_csv_path = Path(top_level_csv)
 
         # Sort files by path length (shorter paths first)
-        # This ensures parent directories are processed before their children
-        files_to_process.sort(key=lambda p: (len(p.parts), str(p)))
+        # This ensures parent directories are processed before their children.
+        # Sorting the scanned strings by separator count avoids parsing a Path per key.
+        paths.sort(key=lambda p: (p.count(os.sep), p))
+        for reason, count in sorted(self._skip_counts.items()):
+            LOG.info(f"Skipped {count} {reason}")
+        files_to_process = [Path(path) for path in paths]
 
         # Process moodle_grades.csv first if it exists
         if moodle_csv_path:
@@ -343,53 +727,72 @@ class DirectoryAnonymizer:
 
         return files_to_process
 
-    def anonymize_file_path(self, file_path, rel_path):
-        # Build the anonymized path by looking up parent and anonymizing the last part
-        parent_path = rel_path.parent
-        # Look up or build the anonymized parent path
-        if parent_path == Path('.'):
-            # Top-level file/directory
-            anonymized_parent = Path('.')
-        else:
-            # Build parent path from cached components
-            # Since we process shortest paths first, all parent components should be cached
-            anonymized_parts = []
-            current_path = ""
-
-            for part in parent_path.parts:
-                # Build the key for this path component
-                current_path = str(Path(current_path) / part) if current_path else part
-
-                if current_path in self.path_cache:
-                    # Use the cached anonymized version
-                    anonymized_parts = list(self.path_cache[current_path].parts)
-                else:
-                    # This directory component hasn't been seen yet (first file in this directory)
-                    # Anonymize this directory component
-                    anon_part, part_mappings = self.anonymize_filename(part, is_directory=True)
-                    self.all_mappings['mappings'].update(part_mappings)
-                    anonymized_parts.append(anon_part)
-                    # Cache the anonymized path
-                    self.path_cache[current_path] = Path(*anonymized_parts)
-
-            anonymized_parent = Path(*anonymized_parts) if anonymized_parts else Path('.')
-
-        # Anonymize the last component (the actual file or final directory)
-        last_part = rel_path.name
-        is_file = file_path.is_file()
-        anonymized_last, last_mappings = self.anonymize_filename(last_part, is_directory=not is_file)
-        self.all_mappings['mappings'].update(last_mappings)
-
-        # Build the complete anonymized path
-        if anonymized_parent == Path('.'):
-            out_rel_path = Path(anonymized_last)
-        else:
-            out_rel_path = anonymized_parent / anonymized_last
+    def _gather_subtree(self, root: str) -> List[str]:
+        """Return the paths of all files under root that should be processed."""
+        return list(self._scan(root))
+
+    def _scan(self, root: str):
+        """Yield the paths of files to process under root, pruning excluded directories."""
+        files, subdirs = self._scan_dir(root)
+        yield from files
+        for subdir in subdirs:
+            yield from self._scan(subdir)
+
+    def _scan_dir(self, root: str) -> Tuple[List[str], List[str]]:
+        """List the files to process and non-excluded subdirectories directly inside root.
+
+        Uses os.scandir so file/directory checks come from the cached DirEntry
+        type rather than a stat per entry, and filters on the entry's name.
+        Like os.walk, symlinked directories are not followed and unreadable
+        directories are skipped.
+        """
+        files, subdirs = [], []
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.should_exclude_dir(entry.name):
+                            self._count_skip('directory (matches exclude pattern)', entry.path)
+                        else:
+                            subdirs.append(entry.path)
+                    elif entry.is_file() and self._should_process(entry.path, entry.name):
+                        files.append(entry.path)
+        except OSError as e:
+            LOG.warning(f"Could not read directory {root}: {e}")
+        return files, subdirs
+
+    def _anonymize_parent(self, parent_parts: Tuple[str, ...]) -> Tuple[str, ...]:
+        """Anonymize a relative directory path given as parts, caching every prefix.
 
-        # Cache this complete path
-        self.path_cache[str(rel_path)] = out_rel_path
+        Args:
+            parent_parts: Components of the directory path relative to the input directory
+
+        Returns:
+            Tuple of anonymized components
+        """
+        cached = self.path_cache.get(parent_parts)
+        if cached is not None:
+            return cached
+
+        anonymized_parts = []
+        # Since we process shortest paths first, most prefixes should already be cached
+        for i, part in enumerate(parent_parts):
+            # Key on the original components up to and including this one
+            key = parent_parts[:i + 1]
+
+            if key in self.path_cache:
+                # Use the cached anonymized version
+                anonymized_parts = list(self.path_cache[key])
+            else:
+                # This directory component hasn't been seen yet (first file in this directory)
+                # Anonymize this directory component
+                anon_part, part_mappings = self.anonymize_filename(part, is_directory=True)
+                self._add_mappings(part_mappings)
+                anonymized_parts.append(anon_part)
+                # Cache the anonymized path
+                self.path_cache[key] = tuple(anonymized_parts)
 
-        return out_rel_path
+        return tuple(anonymized_parts)
 
     def create_report(self, output_path: Path):
         """Create a summary report of the anonymization.
@@ -416,17 +819,13 @@ class DirectoryAnonymizer:
             f.write("\n" + "=" * 50 + "\n")
             f.write("Anonymization summary:\n")
 
-            # Count anonymization replacements by type (PERSON, EMAIL, etc.)
-            type_counts = {}
-            for token, original in self.all_mappings['mappings'].items():
-                # Extract type from token (e.g., REDACTED_PERSON1 -> PERSON)
-                if token.startswith('REDACTED_'):
-                    # Extract the type part (everything between REDACTED_ and the number)
-                    import re
-                    match = re.match(r'REDACTED_([A-Z]+)\d*', token)
-                    if match:
-                        pii_type = match.group(1)
-                        type_counts[pii_type] = type_counts.get(pii_type, 0) + 1
+            # Count anonymization replacements by type (PERSON, EMAIL, etc.),
+            # e.g. REDACTED_PERSON1 -> PERSON; tokens are unique, so one pass over the keys suffices
+            type_counts = Counter(
+                match.group(1)
+                for match in map(_TOKEN_TYPE_RE.match, self.all_mappings['mappings'])
+                if match
+            )
 
             for pii_type, count in sorted(type_counts.items()):
                 f.write(f"  - {pii_type}: {count} unique replacements\n")
@@ -96,7 +96,7 @@ def accuracy_command(args):
         sys.exit(1)
 
 
-def main():
+def main(argv=None):
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(
         description='Anonymize or restore directory contents using anonLLM'
@@ -168,7 +168,7 @@ def main():
     )
     
     # Parse arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     if not args.command:
         parser.print_help()
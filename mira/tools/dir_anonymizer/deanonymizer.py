@@ -1,10 +1,12 @@
 """Directory deanonymizer to restore original content using mappings."""
 
 import os
-import sys
+import re
 import json
 import logging
+import mmap
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 from tqdm import tqdm
 
@@ -13,6 +15,36 @@ from tqdm import tqdm
 logging.basicConfig(level=logging.INFO)
 LOG = logging.getLogger(__name__)
 
+# Number of files restored concurrently
+_RESTORE_WORKERS = 8
+# Files larger than this (bytes) are restored from a memory map rather than read whole
+_STREAM_THRESHOLD = 4 * 1024 * 1024
+# Write buffer for memory-mapped restores, which are written in many pieces
+_STREAM_BUFFER_SIZE = 1 << 20
+
+
+def _iter_files(root: str):
+    """Yield the paths of all files under root except the anonymization report.
+
+    Uses os.scandir so directory checks come from the cached DirEntry type
+    rather than a stat per entry. Like os.walk, symlinked directories are not
+    followed and unreadable directories are skipped.
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif entry.name != 'anonymization_report.txt':
+                    files.append(entry.path)
+    except OSError as e:
+        LOG.warning(f"Could not read directory {root}: {e}")
+    yield from files
+    for subdir in subdirs:
+        yield from _iter_files(subdir)
+
 
 class DirectoryDeanonymizer:
     """Restore anonymized directories to their original content."""
@@ -28,10 +60,84 @@ class DirectoryDeanonymizer:
         if not self.mapping_file.exists():
             raise ValueError(f"Mapping file not found: {mapping_file}")
             
-        with open(self.mapping_file, 'r') as f:
+        with open(self.mapping_file, 'r', encoding='utf-8') as f:
             self.mappings = json.load(f)
-        
-        
+
+        # One alternation of all redacted tokens, longest first so e.g. REDACTED_PERSON10
+        # wins over REDACTED_PERSON1; restoring is then a single scan per text
+        self._tokens = self.mappings.get('mappings', {})
+        self._token_re = (
+            re.compile('|'.join(map(re.escape, sorted(self._tokens, key=len, reverse=True))))
+            if self._tokens else None
+        )
+
+        # Same alternation over UTF-8 bytes, so whole files are restored without decoding
+        self._byte_tokens = {k.encode('utf-8'): v.encode('utf-8') for k, v in self._tokens.items()}
+        self._token_bytes_re = (
+            re.compile(self._token_re.pattern.encode('utf-8')) if self._token_re else None
+        )
+
+        # Legacy format: anonymized relative path -> original relative path
+        self._reverse_files = {v: k for k, v in self.mappings.get('files', {}).items()}
+
+        # Legacy format: normalized original relative path -> its content_mappings
+        self._content_by_path = {}
+        for key, file_content_mappings in self.mappings.get('content_mappings', {}).items():
+            self._content_by_path.setdefault(str(Path(key)), file_content_mappings)
+
+        # Content restoration for this mapping format, chosen once rather than per file
+        self._restore_content = (
+            self._restore_unified_content if 'mappings' in self.mappings
+            else self._restore_legacy_content
+        )
+
+    def _restore_text(self, text: str) -> str:
+        """Replace every redacted token in text with its original value."""
+        if self._token_re is None:
+            return text
+        return self._token_re.sub(lambda m: self._tokens[m.group(0)], text)
+
+    def _restore_unified_content(self, data: bytes, original_rel_path: Path) -> bytes:
+        """Restore raw file bytes using the unified token mappings.
+
+        Matching UTF-8 encoded tokens directly skips decoding and re-encoding,
+        and files without any token come back unchanged, byte for byte.
+        """
+        if self._token_bytes_re is None:
+            return data
+        return self._token_bytes_re.sub(lambda m: self._byte_tokens[m.group(0)], data)
+
+    def _restore_legacy_content(self, data: bytes, original_rel_path: Path) -> bytes:
+        """Restore raw file bytes using the legacy per-file content_mappings, if any."""
+        content = data.decode('utf-8', errors='ignore')
+        # This maintains backward compatibility
+        file_content_mappings = self._content_by_path.get(str(original_rel_path), {})
+        # Apply the file-specific mappings
+        for category, cat_mappings in file_content_mappings.items():
+            if isinstance(cat_mappings, dict):
+                for orig, redacted in cat_mappings.items():
+                    content = content.replace(redacted, orig)
+        return content.encode('utf-8')
+
+    def _restore_streaming(self, file_path: str, out_file_path: Path) -> None:
+        """Restore a large, non-empty file without reading it into memory.
+
+        The file is memory-mapped and scanned for tokens in place; the text
+        between matches is copied straight from the mapping to a buffered
+        output, so only the pages being scanned are resident.
+        """
+        token_bytes_re = self._token_bytes_re
+        with open(file_path, 'rb') as src, \
+                mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+                open(out_file_path, 'wb', buffering=_STREAM_BUFFER_SIZE) as dst:
+            pos = 0
+            if token_bytes_re is not None:
+                for match in token_bytes_re.finditer(data):
+                    dst.write(data[pos:match.start()])
+                    dst.write(self._byte_tokens[match.group(0)])
+                    pos = match.end()
+            dst.write(data[pos:])
+
     def get_original_path(self, anonymized_path: str) -> str:
         """Get the original file path from an anonymized path.
 
@@ -44,24 +150,10 @@ class DirectoryDeanonymizer:
         # Check if we have the new unified mappings format
         if 'mappings' in self.mappings:
             # New format: use string substitution
-            original_path = anonymized_path
-            # Apply reverse mappings (redacted -> original) - sort by length to avoid partial replacements
-            sorted_mappings = sorted(self.mappings['mappings'].items(), key=lambda x: len(x[0]), reverse=True)
-            for redacted, original in sorted_mappings:
-                original_path = original_path.replace(redacted, original)
-            return original_path
-
-        # Legacy format: use literal file mappings
-        elif 'files' in self.mappings:
-            file_mappings = self.mappings.get('files', {})
-            # Create reverse mapping
-            reverse_mappings = {v: k for k, v in file_mappings.items()}
-            # Try to find original path
-            if anonymized_path in reverse_mappings:
-                return reverse_mappings[anonymized_path]
-
-        # If not found in mappings, might be unchanged
-        return anonymized_path
+            return self._restore_text(anonymized_path)
+
+        # Legacy format: use literal file mappings; if not found, might be unchanged
+        return self._reverse_files.get(anonymized_path, anonymized_path)
         
     def restore_directory(self,
                          anonymized_dir: str,
@@ -93,127 +185,82 @@ class DirectoryDeanonymizer:
         # Check mapping format
         is_unified = 'mappings' in self.mappings
 
-        # Get mappings based on format
-        if is_unified:
-            # New unified format
-            unified_mappings = self.mappings.get('mappings', {})
-            file_mappings = {}
-            reverse_file_mappings = {}
-        else:
-            # Legacy format
-            unified_mappings = {}
-            file_mappings = self.mappings.get('files', {})
-            # Create reverse file mapping for legacy format
-            reverse_file_mappings = {v: k for k, v in file_mappings.items()}
-        
         # Collect all files to process
-        files_to_process = []
-        for root, dirs, files in os.walk(anon_path):
-            for file in files:
-                file_path = Path(root) / file
-                # Skip the report file
-                if file == 'anonymization_report.txt':
-                    continue
-                files_to_process.append(file_path)
-                
+        anon_root = str(anon_path)
+        files_to_process = list(_iter_files(anon_root))
+
         stats['total_files'] = len(files_to_process)
         
-        # Process files with progress bar
-        with tqdm(total=len(files_to_process), desc="Restoring files") as pbar:
-            for file_path in files_to_process:
-                try:
-                    # Get relative path from anonymized directory
-                    rel_path = file_path.relative_to(anon_path)
-                    rel_path_str = str(rel_path)
-                    
-                    # Determine original path
-                    if is_unified:
-                        # Use string substitution for unified format
-                        if restore_filenames:
-                            original_path_str = str(rel_path)
-                            # Apply reverse mappings - sort by length (longest first) to avoid partial replacements
-                            sorted_mappings = sorted(unified_mappings.items(), key=lambda x: len(x[0]), reverse=True)
-                            for redacted, original in sorted_mappings:
-                                original_path_str = original_path_str.replace(redacted, original)
-                            original_rel_path = Path(original_path_str)
-                        else:
-                            original_rel_path = rel_path
-                    else:
-                        # Legacy format - use literal mappings
-                        if restore_filenames and rel_path_str in reverse_file_mappings:
-                            original_rel_path = Path(reverse_file_mappings[rel_path_str])
-                        else:
-                            # Try to find by checking all mappings
-                            original_rel_path = None
-                            for orig, anon in file_mappings.items():
-                                if anon == rel_path_str:
-                                    original_rel_path = Path(orig)
-                                    break
-
-                            if original_rel_path is None:
-                                # Assume path wasn't changed
-                                original_rel_path = rel_path
-                            
-                    # Read anonymized content
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        anon_content = f.read()
-                        
-                    # Restore content using string substitution
-                    restored_content = anon_content
-
-                    if is_unified:
-                        # Use unified mappings for content restoration
-                        # Apply reverse mappings (token -> original) - sort by length to avoid partial replacements
-                        sorted_mappings = sorted(unified_mappings.items(), key=lambda x: len(x[0]), reverse=True)
-                        for redacted, original in sorted_mappings:
-                            restored_content = restored_content.replace(redacted, original)
+        # Output directories already created, to skip repeated mkdir calls
+        created_dirs = set()
+
+        def restore_one(file_path: str) -> Optional[Exception]:
+            """Restore a single file, returning the error instead of raising it."""
+            try:
+                # Get relative path from anonymized directory
+                rel_path_str = file_path[len(anon_root) + 1:]
+                rel_path = Path(rel_path_str)
+
+                # Determine original path
+                if is_unified:
+                    # Use string substitution for unified format
+                    if restore_filenames:
+                        original_rel_path = Path(self._restore_text(rel_path_str))
                     else:
-                        # Legacy format - try to extract mappings from content_mappings
-                        # This maintains backward compatibility
-                        content_mappings = self.mappings.get('content_mappings', {})
-                        if content_mappings:
-                            # Look for mappings for this specific file
-                            for key in content_mappings.keys():
-                                if Path(key) == original_rel_path or key == str(original_rel_path):
-                                    file_content_mappings = content_mappings[key]
-                                    # Apply the file-specific mappings
-                                    for category, cat_mappings in file_content_mappings.items():
-                                        if isinstance(cat_mappings, dict):
-                                            for orig, redacted in cat_mappings.items():
-                                                restored_content = restored_content.replace(redacted, orig)
-                                    break
-                        
-                    # Write restored file
-                    out_file_path = out_path / original_rel_path
+                        original_rel_path = rel_path
+                else:
+                    # Legacy format - use literal mappings, assuming unmapped paths weren't changed
+                    original_rel_path = Path(self._reverse_files.get(rel_path_str, rel_path_str))
+
+                out_file_path = out_path / original_rel_path
+                if out_file_path.parent not in created_dirs:
+                    # exist_ok makes a race between workers on the same directory harmless
                     out_file_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    with open(out_file_path, 'w', encoding='utf-8') as f:
-                        f.write(restored_content)
-                        
+                    created_dirs.add(out_file_path.parent)
+
+                if is_unified and os.path.getsize(file_path) > _STREAM_THRESHOLD:
+                    # Large files are scanned through a memory map instead of read whole
+                    self._restore_streaming(file_path, out_file_path)
+                    return None
+
+                # Read anonymized content
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+
+                # Restore content using string substitution and write the restored file
+                out_file_path.write_bytes(self._restore_content(data, original_rel_path))
+            except Exception as e:
+                return e
+            return None
+
+        # Restore files concurrently; file reads and writes release the GIL.
+        # Statistics are only touched here, on the calling thread.
+        with ThreadPoolExecutor(max_workers=_RESTORE_WORKERS) as pool, \
+                tqdm(total=len(files_to_process), desc="Restoring files", mininterval=0.5) as pbar:
+            for file_path, error in zip(files_to_process, pool.map(restore_one, files_to_process)):
+                if error is None:
                     stats['restored_files'] += 1
-                    
-                except Exception as e:
-                    LOG.error(f"Error restoring {file_path}: {e}")
+                else:
+                    LOG.error(f"Error restoring {file_path}: {error}")
                     stats['errors'].append({
-                        'file': str(file_path),
-                        'error': str(e)
+                        'file': file_path,
+                        'error': str(error)
                     })
-                    
                 pbar.update(1)
-                
+
         # Create restoration report
         report_path = out_path / 'restoration_report.txt'
-        with open(report_path, 'w') as f:
-            f.write("Restoration Report\n")
-            f.write("=" * 50 + "\n\n")
-            f.write(f"Total files: {stats['total_files']}\n")
-            f.write(f"Restored files: {stats['restored_files']}\n")
-            
-            if stats['errors']:
-                f.write(f"\nErrors: {len(stats['errors'])}\n")
-                for error in stats['errors'][:10]:
-                    f.write(f"  - {error['file']}: {error['error']}\n")
-                    
+        lines = [
+            "Restoration Report\n",
+            "=" * 50 + "\n\n",
+            f"Total files: {stats['total_files']}\n",
+            f"Restored files: {stats['restored_files']}\n",
+        ]
+        if stats['errors']:
+            lines.append(f"\nErrors: {len(stats['errors'])}\n")
+            lines.extend(f"  - {error['file']}: {error['error']}\n" for error in stats['errors'][:10])
+        report_path.write_text(''.join(lines), encoding='utf-8')
+
         LOG.info(f"Restoration complete. Report saved to {report_path}")
         
         return stats
\ No newline at end of file
@@ -2,21 +2,65 @@
 
 import asyncio
 import logging
-import yaml
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+import os
+import re
 from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
+import yaml
 from tqdm.asyncio import tqdm
 
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:  # libyaml not available, use the pure-Python emitter
+    from yaml import SafeDumper as YamlDumper
+
 from mira.libs.config_loader import ConfigType, get_config
+
 from .grader import SubmissionGrader
-from .rubric_parser import RubricParser
 from .models import GradingResult, RubricCriterion
+from .rubric_parser import RubricParser
 
 LOG = logging.getLogger(__name__)
 
+# Extensions (lowercase) of the code/text files that mark a directory as a submission
+_SUBMISSION_EXTS = frozenset({'.py', '.java', '.cpp', '.c', '.js', '.ts', '.r',
+                              '.md', '.txt', '.ipynb', '.rmd', '.qmd', '.sql'})
+# Student id at the start of an anonymized Moodle directory name
+_STUDENT_ID_RE = re.compile(r'REDACTED_PERSON[^_]*')
+# Common non-submission directories (compared lowercase)
+_SKIP_DIRS = frozenset({'__pycache__', 'node_modules', '.git', 'venv'})
+
+
+def _has_submission_files(root: str) -> bool:
+    """Whether any file under root has a submission extension.
+
+    Walks with os.scandir and an explicit stack, returning at the first match
+    without building a Path per entry. Like rglob, symlinked directories are
+    not descended into.
+    """
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in _SUBMISSION_EXTS and entry.is_file():
+                        return True
+        except OSError:
+            continue
+    return False
+
+
+def _write_yaml(path: Path, data: Dict[str, Any]) -> None:
+    """Write data to a block-style YAML file, keeping key order."""
+    with open(path, 'w') as f:
+        yaml.dump(data, f, Dumper=YamlDumper, default_flow_style=False, sort_keys=False)
+
 
 @dataclass
 class BatchGradingResult:
@@ -97,8 +141,27 @@ class BatchGrader:
         else:
             self.max_concurrent = get_config("tools.max_threads", configs, default=4)
 
+        # Grader shared by all submissions, created on first use
+        self._grader: Optional[SubmissionGrader] = None
+
         LOG.info(f"BatchGrader initialized with max_concurrent={self.max_concurrent}")
 
+    def _get_grader(self) -> SubmissionGrader:
+        """Return the shared grader, creating it on first use.
+
+        Grading calls carry all per-submission state as arguments, so one grader
+        (and its agent and HTTP client) serves every concurrent submission.
+        Creating it lazily keeps a setup failure, such as a missing API key,
+        reported per submission rather than raised from the constructor.
+        """
+        if self._grader is None:
+            self._grader = SubmissionGrader(
+                configs=self.configs,
+                model=self.model,
+                settings=self.settings
+            )
+        return self._grader
+
     def find_submission_directories(self, submissions_dir: Path) -> List[Path]:
         """
         Find all submission directories.
@@ -115,18 +178,12 @@ class BatchGrader:
         for item in submissions_dir.iterdir():
             if item.is_dir() and not item.name.startswith('.'):
                 # Skip common non-submission directories
-                if item.name.lower() in ['__pycache__', 'node_modules', '.git', 'venv']:
+                if item.name.lower() in _SKIP_DIRS:
                     continue
 
                 # Check if it looks like a submission directory
                 # (contains at least one code/text file)
-                has_submission_files = any(
-                    f.suffix in ['.py', '.java', '.cpp', '.c', '.js', '.ts', '.r', '.R',
-                                 '.md', '.txt', '.ipynb', '.Rmd', '.qmd', '.sql']
-                    for f in item.rglob('*') if f.is_file()
-                )
-
-                if has_submission_files:
+                if _has_submission_files(str(item)):
                     submission_dirs.append(item)
                     LOG.debug(f"Found submission directory: {item.name}")
 
@@ -149,25 +206,14 @@ class BatchGrader:
         # Extract student ID from directory name
         # Handle pattern like: REDACTED_PERSON10_325229_assignsubmission_file
         dir_name = submission_dir.name
-        if dir_name.startswith("REDACTED_PERSON"):
-            # Extract just the REDACTED_PERSON{id} part
-            parts = dir_name.split("_")
-            if len(parts) >= 2:
-                student_id = f"{parts[0]}_{parts[1]}"  # e.g., REDACTED_PERSON10
-            else:
-                student_id = dir_name
-        else:
-            student_id = dir_name
+        # Extract just the REDACTED_PERSON{id} part, e.g. REDACTED_PERSON10
+        match = _STUDENT_ID_RE.match(dir_name)
+        student_id = match.group(0) if match else dir_name
 
         LOG.debug(f"Grading submission: {student_id} (dir: {dir_name})")
 
         try:
-            # Create a new grader instance for this submission
-            grader = SubmissionGrader(
-                configs=self.configs,
-                model=self.model,
-                settings=self.settings
-            )
+            grader = self._get_grader()
 
             # Use the evidence-based pipeline asynchronously to avoid nested loops
             grading_result = await grader.grade_submission_directory_async(
@@ -175,10 +221,10 @@ class BatchGrader:
                 rubric_criteria,
             )
 
-            # Save feedback file in submission directory
+            # Save feedback file in submission directory, off the event loop so
+            # other submissions' LLM calls keep running during the write
             feedback_path = submission_dir / feedback_filename
-            with open(feedback_path, 'w') as f:
-                yaml.dump(grading_result.to_yaml_dict(), f, default_flow_style=False, sort_keys=False)
+            await asyncio.to_thread(_write_yaml, feedback_path, grading_result.to_yaml_dict())
 
             LOG.debug(f"Graded {student_id}: {grading_result.total_score}/{grading_result.max_score}")
 
@@ -230,30 +276,34 @@ class BatchGrader:
 
         LOG.info(f"Found {len(submission_dirs)} submission directories")
 
-        # Create a semaphore to limit concurrent tasks
-        semaphore = asyncio.Semaphore(self.max_concurrent)
-
-        async def grade_with_semaphore(submission_dir: Path) -> BatchGradingResult:
-            """Grade a submission with semaphore-controlled concurrency."""
-            async with semaphore:
-                return await self._grade_single_submission_async(
-                    submission_dir, rubric_criteria, feedback_filename
-                )
-
-        # Create all grading tasks
-        tasks = [
-            grade_with_semaphore(submission_dir)
-            for submission_dir in submission_dirs
-        ]
-
-        # Execute tasks with progress bar
-        results = []
+        # A fixed pool of max_concurrent workers pulls directories from a queue,
+        # so only that many grading coroutines exist at any time
+        queue = asyncio.Queue()
+        for item in enumerate(submission_dirs):
+            queue.put_nowait(item)
+
+        # One slot per submission, filled by index so the order doesn't depend on
+        # completion order; slots stay None for unexpected errors that are skipped
+        slots: List[Optional[BatchGradingResult]] = [None] * len(submission_dirs)
+
+        async def worker(pbar: tqdm) -> None:
+            """Grade queued submissions until the queue is empty."""
+            while not queue.empty():
+                index, submission_dir = queue.get_nowait()
+                try:
+                    grading_result = await self._grade_single_submission_async(
+                        submission_dir, rubric_criteria, feedback_filename
+                    )
+                except Exception as e:
+                    import traceback
+                    LOG.error(f"Unexpected error during grading: {e} " + traceback.format_exc())
+                    if not continue_on_error:
+                        raise
+                    continue
+                finally:
+                    pbar.update(1)
 
-        # Use tqdm to show progress
-        for coro in tqdm.as_completed(tasks, total=len(tasks), desc="Grading submissions"):
-            try:
-                grading_result = await coro
-                results.append(grading_result)
+                slots[index] = grading_result
 
                 # Log progress
                 if grading_result.success:
@@ -261,17 +311,24 @@ class BatchGrader:
                 else:
                     LOG.warning(f"Failed: {grading_result.student_id} - {grading_result.error_message}")
 
-            except Exception as e:
-                import traceback
-                LOG.error(f"Unexpected error during grading: {e} " + traceback.format_exc())
-                if not continue_on_error:
-                    # Cancel remaining tasks
-                    for task in tasks:
-                        if not task.done():
-                            task.cancel()
-                    raise
-
-        # Sort results by student ID for consistent output
+        # Use tqdm to show progress
+        with tqdm(total=len(submission_dirs), desc="Grading submissions") as pbar:
+            workers = [
+                asyncio.create_task(worker(pbar))
+                for _ in range(min(self.max_concurrent, len(submission_dirs)))
+            ]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                # Cancel remaining workers
+                for task in workers:
+                    task.cancel()
+                raise
+
+        results = [result for result in slots if result is not None]
+
+        # Sort results by student ID for consistent output; student IDs don't sort
+        # like directory names (REDACTED_PERSON1 vs REDACTED_PERSON10_...), so keep this
         results.sort(key=lambda r: r.student_id)
 
         return results
@@ -307,7 +364,7 @@ class BatchGrader:
         successful = [r for r in results if r.success]
         failed = [r for r in results if not r.success]
 
-        summary = {
+        header = {
             'grading_summary': {
                 'timestamp': datetime.now().isoformat(),
                 'total_submissions': len(results),
@@ -316,10 +373,17 @@ class BatchGrader:
                 'average_score': sum(r.total_score for r in successful) / len(successful) if successful else 0,
                 'max_possible_score': results[0].max_score if results else 0,
             },
-            'submissions': [r.to_dict() for r in results]
         }
 
+        # Emit submissions one at a time rather than materializing them all as
+        # dicts; each one-item list dumps as a "- ..." entry of the block sequence
         with open(output_path, 'w') as f:
-            yaml.dump(summary, f, default_flow_style=False, sort_keys=False)
+            yaml.dump(header, f, Dumper=YamlDumper, default_flow_style=False, sort_keys=False)
+            if not results:
+                f.write('submissions: []\n')
+            else:
+                f.write('submissions:\n')
+                for r in results:
+                    yaml.dump([r.to_dict()], f, Dumper=YamlDumper, default_flow_style=False, sort_keys=False)
 
         LOG.info(f"Summary saved to {output_path}")
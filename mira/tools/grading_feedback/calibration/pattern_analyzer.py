@@ -1,21 +1,36 @@
 """Pattern analyzer for extracting grading patterns from Pass 1 results."""
 
-import yaml
 import logging
-from pathlib import Path
-from typing import Dict, List, Tuple, Optional
-from collections import defaultdict, Counter
-from datetime import datetime
 import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import singledispatch
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
-from .calibration_models import (
-    SituationalAdjustment,
-    CalibratedComponent,
-    CalibrationAnalysis
-)
+import yaml
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # libyaml not available, use the pure-Python parser
+    from yaml import SafeLoader as YamlLoader
+
+from .calibration_models import CalibratedComponent, CalibrationAnalysis, SituationalAdjustment
 
 LOG = logging.getLogger(__name__)
 
+# Quoted text and parenthesized text, used as examples from feedback
+_QUOTED_RE = re.compile(r'"([^"]*)"')
+_PAREN_RE = re.compile(r'\(([^)]*)\)')
+
+# Common feedback words and the pattern they indicate, checked in order
+_KEYWORD_PATTERNS = (
+    (frozenset({'missing', 'no'}), "Component missing or not provided"),
+    (frozenset({'unclear', 'vague'}), "Component present but lacks clarity or specificity"),
+    (frozenset({'good', 'clear'}), "Component meets requirements"),
+    (frozenset({'partial', 'incomplete'}), "Component partially meets requirements"),
+)
+
 
 class PatternAnalyzer:
     """Analyzes grading results to identify patterns and generate adjustments."""
@@ -36,8 +51,8 @@ class PatternAnalyzer:
         """
         with open(grading_file, 'r') as f:
             try:
-                # Try safe_load first (for plain YAML)
-                grading_data = yaml.safe_load(f)
+                # Try a safe load first (for plain YAML)
+                grading_data = yaml.load(f, Loader=YamlLoader)
             except yaml.constructor.ConstructorError as e:
                 # If safe_load fails due to Python objects, use unsafe_load
                 LOG.warning(f"Found Python objects in YAML, using unsafe_load: {e}")
@@ -59,23 +74,21 @@ class PatternAnalyzer:
                 source_file=str(grading_file)
             )
 
-        # Extract patterns from each submission
-        component_data = defaultdict(lambda: {
-            'scores': [],
-            'feedback': [],
-            'max_score': 0
-        })
+        # Extract patterns from each submission, in one pass with each
+        # component's entry looked up once per submission
+        component_data = {}
 
         for submission in submissions:
             components = submission.get('components', {})
             for comp_name, comp_data in components.items():
-                score = comp_data.get('score', 0)
-                max_score = comp_data.get('max_score', 0)
-                feedback = comp_data.get('feedback', '')
+                data = component_data.get(comp_name)
+                if data is None:
+                    data = component_data[comp_name] = {'scores': [], 'feedback': [], 'max_score': 0}
 
-                component_data[comp_name]['scores'].append(score)
-                component_data[comp_name]['feedback'].append((score, feedback))
-                component_data[comp_name]['max_score'] = max_score
+                score = comp_data.get('score', 0)
+                data['scores'].append(score)
+                data['feedback'].append((score, comp_data.get('feedback', '')))
+                data['max_score'] = comp_data.get('max_score', 0)
 
         # Analyze patterns for each component
         calibrated_components = {}
@@ -123,7 +136,9 @@ class PatternAnalyzer:
         # Generate adjustment names based on component and score
         comp_prefix = self._get_component_prefix(comp_name)
 
-        for score, feedbacks in score_groups.items():
+        # Visit score groups most common first, so adjustments come out sorted by
+        # frequency without parsing it back out of the display string
+        for score, feedbacks in sorted(score_groups.items(), key=lambda item: len(item[1]), reverse=True):
             if len(feedbacks) < 2:  # Skip if pattern appears only once
                 continue
 
@@ -160,9 +175,6 @@ class PatternAnalyzer:
                 frequency=f"{len(feedbacks)}/{total_submissions}"
             ))
 
-        # Sort adjustments by frequency (most common first)
-        adjustments.sort(key=lambda x: int(x.frequency.split('/')[0]), reverse=True)
-
         return adjustments
 
     def _get_component_prefix(self, comp_name: str) -> str:
@@ -186,38 +198,29 @@ class PatternAnalyzer:
         if not feedbacks:
             return ""
 
-        # Find common words/phrases
-        words = []
+        # Find common words/phrases, counting each feedback's words as they are split
+        word_counter = Counter()
         for feedback in feedbacks:
-            words.extend(feedback.lower().split())
+            word_counter.update(feedback.lower().split())
 
-        word_counter = Counter(words)
-        common_words = [w for w, c in word_counter.most_common(10) if c > len(feedbacks) / 2]
+        threshold = len(feedbacks) / 2
+        common_words = {w for w, c in word_counter.most_common(10) if c > threshold}
 
         # Try to reconstruct a pattern
-        if 'missing' in common_words or 'no' in common_words:
-            return "Component missing or not provided"
-        elif 'unclear' in common_words or 'vague' in common_words:
-            return "Component present but lacks clarity or specificity"
-        elif 'good' in common_words or 'clear' in common_words:
-            return "Component meets requirements"
-        elif 'partial' in common_words or 'incomplete' in common_words:
-            return "Component partially meets requirements"
-        else:
-            # Use the most common feedback as the pattern
-            return feedbacks[0] if feedbacks else ""
+        for keywords, pattern in _KEYWORD_PATTERNS:
+            if not common_words.isdisjoint(keywords):
+                return pattern
+
+        # Use the most common feedback as the pattern
+        return feedbacks[0]
 
     def _extract_example(self, feedback: str) -> str:
         """Extract example text from feedback."""
-        # Look for quoted text
-        quoted = re.findall(r'"([^"]*)"', feedback)
-        if quoted:
-            return quoted[0]
-
-        # Look for text in parentheses
-        parens = re.findall(r'\(([^)]*)\)', feedback)
-        if parens:
-            return parens[0]
+        # Look for quoted text, then text in parentheses; only the first match is used
+        for pattern in (_QUOTED_RE, _PAREN_RE):
+            match = pattern.search(feedback)
+            if match:
+                return match.group(1)
 
         # Return first few words if no example found
         words = feedback.split()[:5]
@@ -250,21 +253,40 @@ class PatternAnalyzer:
         Returns:
             Cleaned data structure with only plain Python types
         """
-        if isinstance(data, dict):
-            return {k: self._convert_python_objects(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._convert_python_objects(item) for item in data]
-        elif hasattr(data, '__dict__'):
-            # Convert Python object to dict
-            obj_dict = data.__dict__.get('__dict__', {})
-            if obj_dict:
-                return obj_dict
-            else:
-                # Try to extract attributes directly
-                return {
-                    'name': getattr(data, 'name', None),
-                    'description': getattr(data, 'description', None),
-                    'score_impact': getattr(data, 'score_impact', None)
-                }
-        else:
-            return data
\ No newline at end of file
+        return _to_plain(data)
+
+
+@singledispatch
+def _to_plain(data):
+    """Convert a loaded YAML node to plain types, dispatching on its type."""
+    if hasattr(data, '__dict__'):
+        # Convert Python object to dict
+        obj_dict = data.__dict__.get('__dict__', {})
+        if obj_dict:
+            return obj_dict
+        # Try to extract attributes directly
+        return {
+            'name': getattr(data, 'name', None),
+            'description': getattr(data, 'description', None),
+            'score_impact': getattr(data, 'score_impact', None)
+        }
+    return data
+
+
+@_to_plain.register(dict)
+def _(data):
+    return {k: _to_plain(v) for k, v in data.items()}
+
+
+@_to_plain.register(list)
+def _(data):
+    return [_to_plain(item) for item in data]
+
+
+@_to_plain.register(str)
+@_to_plain.register(int)
+@_to_plain.register(float)
+@_to_plain.register(type(None))
+def _(data):
+    # Scalars (including bool, a subclass of int) are already plain
+    return data
@@ -1,6 +1,7 @@
 """Shared utilities for processing submission directories."""
 
 import logging
+import os
 from pathlib import Path
 from typing import List, Tuple
 
@@ -20,6 +21,12 @@ SUBMISSION_EXTENSIONS = [
     '*.csv', '*.pdf'
 ]
 
+# Lowercase suffixes of SUBMISSION_EXTENSIONS, for matching any case in one lookup
+_SUBMISSION_SUFFIXES = frozenset(ext[1:].lower() for ext in SUBMISSION_EXTENSIONS)
+
+# Line separating files in the built submission content
+_SEPARATOR = '=' * 60
+
 # Files to skip during discovery
 SKIP_PATTERNS = ['feedback', 'grading', 'rubric', '.git']
 
@@ -36,37 +43,10 @@ def find_all_submission_files(submission_dir: Path) -> List[Tuple[Path, int]]:
     """
     submission_files = []
 
-    for ext in SUBMISSION_EXTENSIONS:
-        files = list(submission_dir.glob(ext))
-        for file in files:
-            # Skip feedback, rubric, and hidden files
-            if any(skip in file.name.lower() for skip in SKIP_PATTERNS):
-                continue
-            if file.name.startswith('.'):
-                continue
-
-            try:
-                size = file.stat().st_size
-                submission_files.append((file, size))
-            except Exception as e:
-                LOG.warning(f"Could not stat file {file}: {e}")
-
-    # Also check subdirectories (one level deep)
-    for subdir in submission_dir.iterdir():
-        if subdir.is_dir() and not subdir.name.startswith('.'):
-            for ext in SUBMISSION_EXTENSIONS:
-                files = list(subdir.glob(ext))
-                for file in files:
-                    if any(skip in file.name.lower() for skip in SKIP_PATTERNS):
-                        continue
-                    if file.name.startswith('.'):
-                        continue
-
-                    try:
-                        size = file.stat().st_size
-                        submission_files.append((file, size))
-                    except Exception as e:
-                        LOG.warning(f"Could not stat file {file}: {e}")
+    # One scandir pass over the top level, then one per subdirectory (one level deep)
+    subdirs = _scan_submission_entries(submission_dir, submission_files)
+    for subdir in subdirs:
+        _scan_submission_entries(subdir, submission_files)
 
     # Sort by size (largest first) for better visibility
     submission_files.sort(key=lambda x: x[1], reverse=True)
@@ -74,6 +54,41 @@ def find_all_submission_files(submission_dir: Path) -> List[Tuple[Path, int]]:
     return submission_files
 
 
+def _scan_submission_entries(directory: Path, submission_files: List[Tuple[Path, int]]) -> List[Path]:
+    """
+    Add the submission files directly inside a directory to submission_files.
+
+    Args:
+        directory: Directory to scan
+        submission_files: List of (file_path, size) tuples to extend
+
+    Returns:
+        The directory's non-hidden subdirectories
+    """
+    subdirs = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.name.startswith('.'):
+                    subdirs.append(Path(entry.path))
+                continue
+            # Skip hidden, feedback and rubric files with string tests on the
+            # lowercased name, computed once, before the suffix lookup and stat
+            name_lower = entry.name.lower()
+            if name_lower.startswith('.'):
+                continue
+            if any(skip in name_lower for skip in SKIP_PATTERNS):
+                continue
+            if os.path.splitext(name_lower)[1] not in _SUBMISSION_SUFFIXES:
+                continue
+
+            try:
+                submission_files.append((Path(entry.path), entry.stat().st_size))
+            except Exception as e:
+                LOG.warning(f"Could not stat file {entry.path}: {e}")
+    return subdirs
+
+
 def create_submission_summary(submission_dir: Path, files: List[Tuple[Path, int]]) -> str:
     """
     Create a summary of submission contents for LLM to decide which files to review.
@@ -134,7 +149,8 @@ def build_submission_content(submission_dir: Path, files_to_grade: List[Tuple[Pa
     Returns:
         Formatted submission content string
     """
-    submission_content = ""
+    # Collect fragments and join once; repeated += recopies the growing string
+    parts = []
 
     for file_path, size in files_to_grade:
         try:
@@ -142,23 +158,21 @@ def build_submission_content(submission_dir: Path, files_to_grade: List[Tuple[Pa
         except ValueError:
             rel_path = file_path.name
 
-        submission_content += f"\n{'='*60}\n"
-        submission_content += f"FILE: {rel_path}\n"
-        submission_content += f"{'='*60}\n"
+        parts.append(f"\n{_SEPARATOR}\nFILE: {rel_path}\n{_SEPARATOR}\n")
 
         try:
             if file_path.suffix.lower() == '.pdf':
-                submission_content += "[PDF file - content not extracted]\n"
+                parts.append("[PDF file - content not extracted]\n")
             else:
                 content = file_path.read_text(encoding='utf-8', errors='ignore')
                 # Truncate very large files
                 if len(content) > max_file_size:
                     content = content[:max_file_size] + "\n... [truncated] ..."
-                submission_content += content
+                parts.append(content)
         except Exception as e:
-            submission_content += f"[Error reading file: {e}]\n"
+            parts.append(f"[Error reading file: {e}]\n")
 
-    return submission_content
+    return ''.join(parts)
 
 
 def select_files_to_grade(submission_files: List[Tuple[Path, int]],
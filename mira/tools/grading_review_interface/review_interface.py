@@ -55,7 +55,7 @@ class ReviewInterface:
             LOG.warning(f"Anonymization mapping not found: {self.anonymization_mapping_path}")
             return {}
 
-        with open(self.anonymization_mapping_path, 'r') as f:
+        with open(self.anonymization_mapping_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
             return data.get('mappings', {})
 
@@ -16,7 +16,7 @@ logging.basicConfig(
 LOG = logging.getLogger(__name__)
 
 
-def main():
+def main(argv=None):
     """Main entry point for prep-moodle command."""
     parser = argparse.ArgumentParser(
         description='Prepare Moodle homework submissions for anonymized feedback',
@@ -79,7 +79,7 @@ Example:
         help='Show information about existing stage directories and exit'
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Set logging level
     if args.verbose:
@@ -15,7 +15,7 @@ logging.basicConfig(
 LOG = logging.getLogger(__name__)
 
 
-def main():
+def main(argv=None):
     """Main entry point for update-moodle-grades command."""
     parser = argparse.ArgumentParser(
         description='Update moodle_grades.csv with scores from feedback.yaml files',
@@ -53,7 +53,7 @@ Example:
         help='Enable verbose logging'
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # Set logging level
     if args.verbose:
@@ -0,0 +1,115 @@
+"""Tests for the PII detection accuracy metrics and report."""
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+from mira.tools.dir_anonymizer.accuracy import AccuracyMetrics, AccuracyTester
+
+
+class TestAccuracyMetrics:
+    """Test precision/recall calculation and report generation."""
+
+    def test_precision_recall_f1(self):
+        """Test metrics for lists and sets give identical results."""
+        metrics = AccuracyMetrics()
+
+        from_lists = metrics.calculate_precision_recall_f1(
+            ['alice', 'bob', 'bob', 'carol'], ['alice', 'bob', 'dave']
+        )
+        from_sets = metrics.calculate_precision_recall_f1(
+            {'alice', 'bob', 'carol'}, frozenset({'alice', 'bob', 'dave'})
+        )
+
+        assert from_lists == from_sets
+        assert from_lists['true_positives'] == 2
+        assert from_lists['false_positives'] == 1
+        assert from_lists['false_negatives'] == 1
+        assert from_lists['precision'] == pytest.approx(2 / 3)
+        assert from_lists['recall'] == pytest.approx(2 / 3)
+        assert from_lists['f1'] == pytest.approx(2 / 3)
+
+    def test_precision_recall_f1_empty(self):
+        """Test that empty inputs yield zero metrics instead of dividing by zero."""
+        metrics = AccuracyMetrics().calculate_precision_recall_f1([], [])
+
+        assert metrics['precision'] == 0.0
+        assert metrics['recall'] == 0.0
+        assert metrics['f1'] == 0.0
+
+    def test_generate_report(self):
+        """Test the report groups results and failures by category."""
+        results = [
+            {'id': 'email_1', 'category': 'emails', 'passed': True, 'errors': [],
+             'expected': {'REDACTED_EMAIL1': 'a@example.com'},
+             'detected': {'REDACTED_EMAIL1': 'a@example.com'}},
+            {'id': 'name_1', 'category': 'names', 'passed': False,
+             'errors': ["Not detected: 'Bob Jones'"],
+             'expected': {'REDACTED_PERSON1': 'Bob Jones'},
+             'detected': {}},
+            {'id': 'name_2', 'category': 'names', 'passed': True, 'errors': [],
+             'expected': {'REDACTED_PERSON1': 'Ann Lee'},
+             'detected': {'REDACTED_PERSON1': 'Ann Lee'}},
+        ]
+
+        report = AccuracyMetrics().generate_report(results)
+
+        assert "Total Test Cases: 3" in report
+        assert "Passed: 2" in report
+        assert "EMAILS:" in report
+        assert "NAMES:" in report
+        assert "Recall: 50.0%" in report
+        assert "• name_1: Not detected: 'Bob Jones'" in report
+        assert "Weighted Average F1 Score:" in report
+
+
+class TestAccuracyTester:
+    """Test running YAML test cases through the anonymizer."""
+
+    def test_run_all_tests_uses_batched_detection(self, tmp_path):
+        """Test that all inputs are detected in one batch and skips are honored."""
+        (tmp_path / "cases.yaml").write_text(
+            "test_cases:\n"
+            "  - id: email\n"
+            "    category: emails\n"
+            "    input: 'Mail a@example.com'\n"
+            "    expected: {REDACTED_EMAIL1: a@example.com}\n"
+            "  - id: skipped\n"
+            "    input: 'ignored'\n"
+            "    tags: [skip]\n"
+            "  - id: clean\n"
+            "    category: false_positives\n"
+            "    input: 'Nothing here'\n"
+            "    tags: [false_positive]\n"
+        )
+
+        with patch('mira.libs.local_anonymizer.anonymizer.PresidioBackend') as backend_cls:
+            backend = Mock()
+            backend.num_tokens.return_value = 1
+            backend.detect_pii_batch.side_effect = lambda texts: [{} for _ in texts]
+            backend_cls.return_value = backend
+
+            tester = AccuracyTester(config={'anonymizer': {}}, test_dir=tmp_path)
+            results = tester.run_all_tests()
+
+        backend.detect_pii_batch.assert_called_once_with(['Mail a@example.com', 'Nothing here'])
+        backend.detect_pii.assert_not_called()
+        assert [r['passed'] for r in results] == [True, False, True]
+        assert results[1]['skipped']
+
+    def test_validate_detection_reports_sorted_errors(self):
+        """Test missing and unexpected values are reported in a stable order."""
+        tester = AccuracyTester.__new__(AccuracyTester)
+
+        errors = tester.validate_detection(
+            {'REDACTED_PERSON1': 'Zed', 'REDACTED_PERSON2': 'Amy', 'REDACTED_EMAIL1': 'a@b.co'},
+            {'REDACTED_EMAIL1': 'a@b.co', 'REDACTED_PERSON1': 'Tom', 'REDACTED_PERSON2': 'Bob'},
+            {'category': 'names'},
+        )
+
+        assert errors == [
+            "Not detected: 'Amy'",
+            "Not detected: 'Zed'",
+            "Unexpected detection (names): 'Bob'",
+            "Unexpected detection (names): 'Tom'",
+        ]
@@ -253,6 +253,10 @@ def test_grade_all_submissions_sync(mock_parser_class, mock_grader_class,
         assert all(r.success for r in results)
         assert all(r.total_score == 85 for r in results)
 
+        # One grader is shared across all submissions
+        mock_grader_class.assert_called_once()
+        assert mock_grader.grade_submission_directory_async.await_count == 3
+
 
 def test_save_summary():
     """Test saving grading summary to YAML."""
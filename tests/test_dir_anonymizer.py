@@ -6,6 +6,7 @@ import json
 import tempfile
 import shutil
 from pathlib import Path
+from unittest.mock import Mock
 import pytest
 
 from mira.libs.config_loader import ConfigType
@@ -183,6 +184,68 @@ def test_anonymize_and_restore(temp_test_dir):
 
 
 
+def test_restore_prefers_longest_token(tmp_path):
+    """Test that REDACTED_PERSON10 is not restored as REDACTED_PERSON1 followed by '0'."""
+    mapping_file = tmp_path / 'mapping.json'
+    mapping_file.write_text(json.dumps({'mappings': {
+        'REDACTED_PERSON1': 'Alice', 'REDACTED_PERSON10': 'Bob'
+    }}))
+    anon_dir = tmp_path / 'anon'
+    (anon_dir / 'REDACTED_PERSON10').mkdir(parents=True)
+    (anon_dir / 'REDACTED_PERSON10' / 'notes.txt').write_text(
+        'REDACTED_PERSON1 and REDACTED_PERSON10\n')
+
+    deanonymizer = DirectoryDeanonymizer(str(mapping_file))
+    assert deanonymizer.get_original_path('REDACTED_PERSON10/x.py') == 'Bob/x.py'
+    stats = deanonymizer.restore_directory(str(anon_dir), str(tmp_path / 'out'))
+
+    assert stats['restored_files'] == 1
+    assert (tmp_path / 'out' / 'Bob' / 'notes.txt').read_text() == 'Alice and Bob\n'
+
+
+def test_restore_streams_large_files(tmp_path, monkeypatch):
+    """Test that files over the streaming threshold restore the same as small ones."""
+    from mira.tools.dir_anonymizer import deanonymizer as deanonymizer_module
+    monkeypatch.setattr(deanonymizer_module, '_STREAM_THRESHOLD', 0)
+
+    mapping_file = tmp_path / 'mapping.json'
+    mapping_file.write_text(json.dumps({'mappings': {'REDACTED_PERSON1': 'Alice'}}))
+    anon_dir = tmp_path / 'anon'
+    anon_dir.mkdir()
+    content = ''.join(f'line {i}: REDACTED_PERSON1\r\n' for i in range(2500))
+    (anon_dir / 'big.txt').write_bytes(content.encode('utf-8'))
+
+    stats = DirectoryDeanonymizer(str(mapping_file)).restore_directory(
+        str(anon_dir), str(tmp_path / 'out'))
+
+    assert stats['restored_files'] == 1
+    restored = (tmp_path / 'out' / 'big.txt').read_bytes().decode('utf-8')
+    assert restored == content.replace('REDACTED_PERSON1', 'Alice')
+
+
+def test_restore_skips_unreadable_directories(tmp_path, monkeypatch):
+    """Test that a directory that cannot be listed is skipped rather than aborting the restore."""
+    mapping_file = tmp_path / 'mapping.json'
+    mapping_file.write_text(json.dumps({'mappings': {'REDACTED_PERSON1': 'Alice'}}))
+    anon_dir = tmp_path / 'anon'
+    (anon_dir / 'locked').mkdir(parents=True)
+    (anon_dir / 'locked' / 'hidden.txt').write_text('REDACTED_PERSON1')
+    (anon_dir / 'notes.txt').write_text('REDACTED_PERSON1 wrote this')
+
+    scandir = os.scandir
+    def failing_scandir(path):
+        if os.path.basename(path) == 'locked':
+            raise PermissionError(13, 'Permission denied', path)
+        return scandir(path)
+    monkeypatch.setattr(os, 'scandir', failing_scandir)
+
+    stats = DirectoryDeanonymizer(str(mapping_file)).restore_directory(
+        str(anon_dir), str(tmp_path / 'out'))
+
+    assert stats['restored_files'] == 1
+    assert (tmp_path / 'out' / 'notes.txt').read_text() == 'Alice wrote this'
+
+
 def test_custom_config():
     """Test loading anonymizer with custom configuration."""
     custom_config = {
@@ -210,6 +273,157 @@ def test_custom_config():
     assert anonymizer.anon_config['options']['anonymize_filenames'] is True
 
 
+def test_exclude_patterns():
+    """Test that extension and exclude-pattern filters match fnmatch semantics."""
+    config = get_test_config()
+    config['anonymizer']['file_types'] = ['.py', '.R']
+    config['anonymizer']['exclude_patterns'] = ['node_modules', 'test_*', '.git/*']
+    anonymizer = DirectoryAnonymizer(config=config)
+
+    assert anonymizer.should_process_file('/work/src/main.py')
+    assert anonymizer.should_process_file('/work/analysis.r')
+    assert anonymizer.should_process_file('/work/moodle_grades.csv')
+    assert not anonymizer.should_process_file('/work/notes.docx')
+    assert not anonymizer.should_process_file('/work/src/test_main.py')
+    assert not anonymizer.should_process_file('.git/hooks.py')
+
+    assert anonymizer.should_exclude_dir('node_modules')
+    assert not anonymizer.should_exclude_dir('node_modules_backup')
+    assert not anonymizer.should_exclude_dir('src')
+
+
+def test_gather_files_many_subtrees(tmp_path):
+    """Test that gathering across many top-level directories is complete and ordered."""
+    for i in range(6):
+        (tmp_path / f'student{i}' / 'src').mkdir(parents=True)
+        (tmp_path / f'student{i}' / 'src' / 'main.py').write_text('pass')
+        (tmp_path / f'student{i}' / 'notes.txt').write_text('notes')
+        (tmp_path / f'student{i}' / '__pycache__').mkdir()
+        (tmp_path / f'student{i}' / '__pycache__' / 'main.py').write_text('pass')
+    (tmp_path / 'moodle_grades.csv').write_text('Full name\n')
+    (tmp_path / 'README.md').write_text('readme')
+
+    config = get_test_config()
+    config['anonymizer']['exclude_patterns'] = ['__pycache__']
+    files = DirectoryAnonymizer(config=config).gather_files_to_process(tmp_path)
+
+    rel = [str(p.relative_to(tmp_path)) for p in files]
+    assert rel[0] == 'moodle_grades.csv'
+    assert rel[1] == 'README.md'
+    assert rel[2:8] == [f'student{i}/notes.txt' for i in range(6)]
+    assert rel[8:] == [f'student{i}/src/main.py' for i in range(6)]
+
+
+def test_filename_extension_split():
+    """Test that only the base name of a file is sent for anonymization."""
+    anonymizer = DirectoryAnonymizer(config=get_test_config())
+    seen = []
+    anonymizer.anonymizer.anonymize_data = lambda text: (seen.append(text) or text.upper(), {})
+
+    assert anonymizer.anonymize_filename('John.Smith_hw1.py') == ('JOHN.SMITH_HW1.py', {})
+    assert anonymizer.anonymize_filename('Backup.tar.gz') == ('BACKUP.tar.gz', {})
+    assert anonymizer.anonymize_filename('Jane.Doe', is_directory=True) == ('JANE.DOE', {})
+    assert seen == ['John.Smith_hw1', 'Backup', 'Jane.Doe']
+
+
+def test_filename_detection_skipped_without_pii_markers():
+    """Test that skip_unmarked_filenames lets plain lowercase filenames bypass PII detection."""
+    anonymizer = DirectoryAnonymizer(config=get_test_config())
+    seen = []
+    anonymizer.anonymizer.anonymize_data = lambda text: (seen.append(text) or text, {})
+    # Off by default: lowercase names like this one still reach the detector
+    anonymizer.anonymize_filename('john_smith_hw1.py')
+    assert seen == ['john_smith_hw1']
+
+    config = get_test_config()
+    config['anonymizer']['options']['skip_unmarked_filenames'] = True
+    anonymizer = DirectoryAnonymizer(config=config)
+    seen = []
+    anonymizer.anonymizer.anonymize_data = lambda text: (seen.append(text) or text, {})
+
+    for name in ['main.py', 'hw1_utils.py', '.env', 'src', 'report_v2.txt', 'john_smith_hw1.py']:
+        assert anonymizer.anonymize_filename(name) == (name, {})
+    assert seen == []
+
+    for name in ['Smith_hw1.py', 'a@b.co.txt', 'call_5551234567.txt', 'Smith_hw1.md']:
+        anonymizer.anonymize_filename(name)
+    # Repeated base names are served from the filename cache
+    assert seen == ['Smith_hw1', 'a@b.co', 'call_5551234567']
+
+
+def test_prefetch_filenames_single_batch(tmp_path):
+    """Test that distinct name components are detected in one ordered batch."""
+    files = [
+        tmp_path / 'moodle_grades.csv',
+        tmp_path / 'Ann Lee_1_assignsubmission_file' / 'Report.py',
+        tmp_path / 'Bob Ray_2_assignsubmission_file' / 'Report.py',
+        tmp_path / 'Bob Ray_2_assignsubmission_file' / 'main.py',
+    ]
+    anonymizer = DirectoryAnonymizer(config=get_test_config())
+    batches = []
+    anonymizer.anonymizer.anonymize_data_batch = lambda texts: batches.append(texts) or [(t, {}) for t in texts]
+    anonymizer.anonymizer.anonymize_data = Mock(side_effect=AssertionError('unbatched call'))
+
+    anonymizer.prefetch_filenames(files, tmp_path)
+    assert batches == [['Ann Lee', 'Report', 'Bob Ray', 'main']]
+
+    assert anonymizer.anonymize_filename('Report.py') == ('Report.py', {})
+    name, _ = anonymizer.anonymize_filename('Ann Lee_1_assignsubmission_file', is_directory=True)
+    assert name == 'REDACTED_PERSON1_1_assignsubmission_file'
+
+
+def test_identical_contents_anonymized_once(tmp_path, monkeypatch):
+    """Test that repeated contents reuse one result and the content cache stays bounded."""
+    import mira.tools.dir_anonymizer.anonymizer as anonymizer_module
+    monkeypatch.setattr(anonymizer_module, '_CONTENT_CACHE_CHARS', 30)
+
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    contents = {'a.txt': 'Written by Ann Lee', 'b.txt': 'Written by Ann Lee',
+                'c.txt': 'Written by Bob Ray', 'd.txt': 'no markers here'}
+    for name, text in contents.items():
+        (input_dir / name).write_text(text)
+
+    config = get_test_config()
+    config['anonymizer']['options']['anonymize_filenames'] = False
+    config['anonymizer']['options']['skip_unmarked_content'] = True
+    anonymizer = DirectoryAnonymizer(config=config)
+    batches = []
+    def anonymize_batch(texts):
+        batches.append(texts)
+        return [(t.upper(), {}) for t in texts]
+    anonymizer.anonymizer.anonymize_data_batch = anonymize_batch
+
+    files = sorted(input_dir.iterdir())
+    anonymizer.anonymize_files(files, input_dir, tmp_path / 'out')
+    assert batches == [['Written by Ann Lee', 'Written by Bob Ray']]
+    assert (tmp_path / 'out' / 'b.txt').read_text() == 'WRITTEN BY ANN LEE'
+    assert (tmp_path / 'out' / 'd.txt').read_text() == 'no markers here'
+
+    # Only the most recent result fits the budget; pass-through content is never cached
+    assert len(anonymizer._content_cache) == 1
+    assert anonymizer._content_cache_chars == len('WRITTEN BY BOB RAY')
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_mapping_file_keeps_non_ascii(tmp_path, monkeypatch, use_orjson):
+    """Test that the mapping file stores non-ASCII originals as UTF-8, with or without orjson."""
+    import mira.tools.dir_anonymizer.anonymizer as anonymizer_module
+    if not use_orjson:
+        monkeypatch.setattr(anonymizer_module, 'orjson', None)
+    elif anonymizer_module.orjson is None:
+        pytest.skip('orjson not installed')
+
+    anonymizer = DirectoryAnonymizer(config=get_test_config())
+    anonymizer.all_mappings['mappings'] = {'REDACTED_PERSON1': 'José Müller'}
+    mapping_file = tmp_path / 'mapping.json'
+    anonymizer.write_mapping_file(mapping_file)
+
+    data = mapping_file.read_bytes()
+    assert 'José Müller'.encode('utf-8') in data
+    assert b'\\u' not in data
+
+
 def test_file_type_filtering(temp_test_dir):
     """Test that only configured file types are processed."""
     # Create additional files with different extensions
@@ -52,6 +52,10 @@ def mock_presidio_backend():
             "credit_cards": [],
             "ssn": []
         }
+        # Batched detection behaves like detect_pii applied to each text
+        mock_instance.detect_pii_batch.side_effect = (
+            lambda texts: [mock_instance.detect_pii(text) for text in texts]
+        )
         # Add num_tokens method that returns a simple token count
         mock_instance.num_tokens.return_value = 10
         mock.return_value = mock_instance
@@ -205,6 +209,17 @@ class TestLocalAnonymizer:
         anon_text4, _ = anonymizer.anonymize_data(text4)
         assert "REDACTED_EMAIL1" in anon_text4
 
+    def test_batch_matches_sequential(self, mock_presidio_backend):
+        """Test that batch anonymization tags entities like sequential calls."""
+        texts = ["Email: a@example.com", "", "Email: b@example.com or a@example.com"]
+
+        batched = LocalAnonymizer().anonymize_data_batch(texts)
+        sequential_anonymizer = LocalAnonymizer()
+        sequential = [sequential_anonymizer.anonymize_data(text) for text in texts]
+
+        assert batched == sequential
+        assert batched[2][0] == "Email: REDACTED_EMAIL2 or REDACTED_EMAIL1"
+
 
 class TestLocalDeanonymizer:
     """Test the LocalDeanonymizer class."""
@@ -300,7 +315,80 @@ class TestDirectoryAnonymization:
             
         finally:
             shutil.rmtree(output_dir, ignore_errors=True)
-    
+
+    def test_streaming_large_files(self, temp_test_dir, mock_presidio_backend):
+        """Test that files over the streaming threshold match whole-file output."""
+        whole_dir = tempfile.mkdtemp()
+        streamed_dir = tempfile.mkdtemp()
+
+        try:
+            config = get_test_config()
+            DirectoryAnonymizer(config=config, anonymize_filenames=False).process_directory(
+                input_dir=temp_test_dir, output_dir=whole_dir
+            )
+            config['anonymizer']['options']['stream_threshold_bytes'] = 0
+            results = DirectoryAnonymizer(config=config, anonymize_filenames=False).process_directory(
+                input_dir=temp_test_dir, output_dir=streamed_dir
+            )
+
+            assert results['statistics']['skipped_files'] == 0
+            for whole_file in Path(whole_dir).rglob('*.py'):
+                streamed_file = Path(streamed_dir) / whole_file.relative_to(whole_dir)
+                assert streamed_file.read_text() == whole_file.read_text()
+
+        finally:
+            shutil.rmtree(whole_dir, ignore_errors=True)
+            shutil.rmtree(streamed_dir, ignore_errors=True)
+
+    def test_duplicate_contents_anonymized_once(self, tmp_path, mock_presidio_backend):
+        """Test that identical file contents are only sent to detection once."""
+        input_dir = tmp_path / "input"
+        for name in ("a", "b", "c"):
+            (input_dir / name).mkdir(parents=True)
+            (input_dir / name / "template.py").write_text("# Contact jane@example.com\n")
+
+        anonymizer = DirectoryAnonymizer(config=get_test_config(), anonymize_filenames=False)
+        results = anonymizer.process_directory(input_dir=str(input_dir), output_dir=str(tmp_path / "out"))
+
+        detected = [text for call in mock_presidio_backend.detect_pii_batch.call_args_list
+                    for text in call.args[0]]
+        assert detected == ["# Contact jane@example.com\n"]
+        assert results['statistics']['processed_files'] == 3
+        for name in ("a", "b", "c"):
+            assert (tmp_path / "out" / name / "template.py").read_text() == "# Contact REDACTED_EMAIL1\n"
+
+    def test_content_without_pii_markers_skips_detection(self, tmp_path, mock_presidio_backend):
+        """Test that skip_unmarked_content copies probe-free contents without detection.
+
+        Lowercase names carry no marker, so they are skipped too: that is the
+        false-negative risk that keeps the option off by default.
+        """
+        input_dir = tmp_path / "input"
+        input_dir.mkdir()
+        (input_dir / "plain.py").write_text("def main():\n    return none\n")
+        (input_dir / "chat.txt").write_text("thanks john smith\n")
+        (input_dir / "contact.py").write_text("# Contact jane@example.com\n")
+
+        def detected_texts():
+            return [text for call in mock_presidio_backend.detect_pii_batch.call_args_list
+                    for text in call.args[0]]
+
+        # Default: every file goes through detection
+        anonymizer = DirectoryAnonymizer(config=get_test_config(), anonymize_filenames=False)
+        anonymizer.process_directory(input_dir=str(input_dir), output_dir=str(tmp_path / "out"))
+        assert sorted(detected_texts()) == sorted([
+            "def main():\n    return none\n", "thanks john smith\n", "# Contact jane@example.com\n"
+        ])
+
+        mock_presidio_backend.detect_pii_batch.reset_mock()
+        config = get_test_config()
+        config['anonymizer']['options']['skip_unmarked_content'] = True
+        anonymizer = DirectoryAnonymizer(config=config, anonymize_filenames=False)
+        anonymizer.process_directory(input_dir=str(input_dir), output_dir=str(tmp_path / "skipped"))
+        assert detected_texts() == ["# Contact jane@example.com\n"]
+        assert (tmp_path / "skipped" / "plain.py").read_text() == "def main():\n    return none\n"
+        assert (tmp_path / "skipped" / "chat.txt").read_text() == "thanks john smith\n"
+
     @pytest.mark.skip(reason="Filename anonymization uses actual Presidio backend, tested in integration tests")
     def test_filename_anonymization(self, temp_test_dir, mock_presidio_backend):
         """Test anonymizing filenames."""
@@ -436,4 +524,115 @@ class TestEntityTagFormats:
         
         # Should have PHONE1, PHONE2
         assert "REDACTED_PHONE1" in anon_text
-        assert "REDACTED_PHONE2" in anon_text
\ No newline at end of file
+        assert "REDACTED_PHONE2" in anon_text
+
+class TestPresidioBackendCache:
+    """Test the on-disk detection cache of PresidioBackend."""
+
+    @staticmethod
+    def _fake_analyzer():
+        analyzer = Mock()
+        analyzer.analyze.return_value = [Mock(start=0, end=10, entity_type="PERSON")]
+        return analyzer
+
+    def test_cache_hit_skips_analyzer(self, tmp_path):
+        """Repeated text is served from disk, even by a fresh backend."""
+        from mira.libs.local_anonymizer.presidio_backend import PresidioBackend
+
+        backend = PresidioBackend(cache_dir=tmp_path)
+        backend.analyzer = self._fake_analyzer()
+
+        first = backend.detect_pii("John Smith wrote this")
+        second = backend.detect_pii("John Smith wrote this")
+        assert first == second == {"persons": ["John Smith"]}
+        assert backend.analyzer.analyze.call_count == 1
+        backend.close()
+
+        fresh = PresidioBackend(cache_dir=tmp_path)
+        fresh.analyzer = self._fake_analyzer()
+        assert fresh.detect_pii("John Smith wrote this") == {"persons": ["John Smith"]}
+        fresh.analyzer.analyze.assert_not_called()
+
+    def test_batch_uses_cache(self, tmp_path):
+        """Batched detection serves hits from the cache and stores the misses."""
+        from mira.libs.local_anonymizer.presidio_backend import PresidioBackend
+
+        backend = PresidioBackend(cache_dir=tmp_path)
+        backend.analyzer = self._fake_analyzer()
+        backend.detect_pii("John Smith wrote this")
+        backend.close()
+
+        analyzed = []
+        def analyze_iterator(texts, **kwargs):
+            analyzed.extend(texts)
+            return [[Mock(start=0, end=10, entity_type="PERSON")] for _ in texts]
+
+        fresh = PresidioBackend(cache_dir=tmp_path)
+        fresh.analyzer = self._fake_analyzer()
+        with patch('mira.libs.local_anonymizer.presidio_backend.BatchAnalyzerEngine') as engine:
+            engine.return_value.analyze_iterator.side_effect = analyze_iterator
+            results = fresh.detect_pii_batch(["John Smith wrote this", "", "Jane Adams wrote that"])
+            again = fresh.detect_pii_batch(["Jane Adams wrote that"])
+
+        assert results == [{"persons": ["John Smith"]}, {}, {"persons": ["Jane Adams"]}]
+        assert again == [{"persons": ["Jane Adams"]}]
+        assert analyzed == ["Jane Adams wrote that"]
+
+    def test_clear_cache_and_settings_change(self, tmp_path):
+        """Clearing the cache or changing settings forces a new analysis."""
+        from mira.libs.local_anonymizer.presidio_backend import PresidioBackend
+
+        backend = PresidioBackend(cache_dir=tmp_path)
+        backend.analyzer = self._fake_analyzer()
+        backend.detect_pii("John Smith wrote this")
+        backend.flush_cache()
+
+        other = PresidioBackend(cache_dir=tmp_path, confidence_threshold=0.9)
+        other.analyzer = self._fake_analyzer()
+        other.detect_pii("John Smith wrote this")
+        assert other.analyzer.analyze.call_count == 1
+        other.close()
+
+        backend.clear_cache()
+        backend.detect_pii("John Smith wrote this")
+        assert backend.analyzer.analyze.call_count == 2
+
+    def test_model_upgrade_invalidates_cache(self, tmp_path):
+        """A new spaCy model version misses detections cached by the old one."""
+        from mira.libs.local_anonymizer.presidio_backend import PresidioBackend
+
+        def versions(model_version):
+            return lambda name: model_version if name.startswith("en_core_web") else "2.2.0"
+
+        target = 'mira.libs.local_anonymizer.presidio_backend.metadata.version'
+        with patch(target, side_effect=versions("3.7.0")):
+            backend = PresidioBackend(cache_dir=tmp_path)
+        backend.analyzer = self._fake_analyzer()
+        backend.detect_pii("John Smith wrote this")
+        backend.close()
+
+        with patch(target, side_effect=versions("3.8.0")):
+            upgraded = PresidioBackend(cache_dir=tmp_path)
+        upgraded.analyzer = self._fake_analyzer()
+        upgraded.detect_pii("John Smith wrote this")
+        assert upgraded.analyzer.analyze.call_count == 1
+
+    def test_commits_batched_and_flushed_on_close(self, tmp_path):
+        """Single detections share a transaction that close() commits for later runs."""
+        from mira.libs.local_anonymizer.presidio_backend import PresidioBackend
+
+        backend = PresidioBackend(cache_dir=tmp_path)
+        backend.analyzer = self._fake_analyzer()
+        backend.detect_pii("John Smith wrote this")
+        backend.detect_pii("John Smith wrote that")
+        assert backend._cache_db.in_transaction
+
+        backend.close()
+        backend.close()  # Idempotent
+        assert backend._cache_db is None
+
+        fresh = PresidioBackend(cache_dir=tmp_path)
+        fresh.analyzer = self._fake_analyzer()
+        fresh.detect_pii("John Smith wrote that")
+        fresh.analyzer.analyze.assert_not_called()
+        fresh.close()
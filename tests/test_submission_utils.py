@@ -57,6 +57,26 @@ def test_find_all_submission_files():
         assert sizes == sorted(sizes, reverse=True)
 
 
+def test_find_all_submission_files_suffix_case_and_directories():
+    """Test that suffixes match in any case and directories named like files are searched, not listed."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+
+        (tmpdir / "Main.PY").write_text("print('hello')")
+        (tmpdir / "Analysis.RMD").write_text("# Analysis")
+        (tmpdir / "notes.Txt").write_text("notes")
+        (tmpdir / "image.PNG").write_text("not a submission file")
+
+        # A directory whose name ends in a listed extension
+        (tmpdir / "foo.py").mkdir()
+        (tmpdir / "foo.py" / "inner.py").write_text("x = 1")
+
+        files = find_all_submission_files(tmpdir)
+
+        assert sorted(f[0].name for f in files) == ["Analysis.RMD", "Main.PY", "inner.py", "notes.Txt"]
+        assert all(f[0].is_file() for f in files)
+
+
 def test_find_all_submission_files_empty_dir():
     """Test finding files in an empty directory."""
     with tempfile.TemporaryDirectory() as tmpdir: